@@ -5,7 +5,9 @@ LSAnimation object maintains a list of frames which can be manipulated using
 methods specific to the subclass. Each frame is a list of integers representing
 segments that need to be illuminated. The first item in the list represents the
 width of the frame in columns. All of the frames that make up a given animation
-must have the same dimensions.
+must have the same dimensions. LSAnimation stores its frames back to back in a
+single bytearray and hands them out as lists again when they are played, while
+getFrame() gives a single frame's masks as bytes.
 
 The rest of a the numbers in the frame are a repeating pattern of Red, Green, 
 and Blue color masks, every three belonging to tiles succesively scanned from 
@@ -21,10 +23,22 @@ the compacted list-type frames required by LSAnimation whenever the get() method
 is called. A simple technique for programatically generating animations is thus
 to maintain one or more LSFrameGen objects that you apply transformations to
 while iteratively adding the output of get() to your LSAnimation object.
+LSFrameGen can shift its tiles in any direction, including diagonally, and flip
+and rotate them.
 
-Using the mergeFrames tool you can merge the contents of a frame, at an
-arbitrary offset, into another frame of equal or greater size. By unpacking and
-merging the frames from two animations you can create a new combined animation.
+Using the blitFrame tool you can draw a frame over another frame at an arbitrary
+offset, clipping whatever falls outside it and letting tiles with no update
+show through. By unpacking and blitting the frames from two animations you can
+create a new combined animation.
+
+Animations that are too long to keep in memory, or that never end, can be made
+frame by frame as they play with LSAnimationStream, which wraps a generator or a
+per-frame callback and converts to and from LSAnimation.
+
+play() holds up its caller until the animation ends. Games running under
+LSGameEngine should start their animations on the engine's LSAnimator instead,
+which plays any number of them at once a frame at a time while the game keeps
+handling steps.
 
 Example:
 
@@ -89,7 +103,10 @@ Example:
 
 """
 
-from collections import defaultdict
+from collections import OrderedDict
+from queue import Full
+from queue import Queue
+import threading
 import time
 import itertools
 
@@ -101,38 +118,64 @@ from lightsweeper import lsdisplay
 # TODO: Custom error handlers
 
 def validateFrame(frame):
-   # print(repr(frame)) # Debugging
+    """
+        Returns True if frame is a well formed frame: a column count followed by
+        whole rows of (red, green, blue) masks, each no greater than 128.
+    """
     frameLen = len(frame) - 1
-    if frameLen % 3 is not 0:
-        return False
-    cells = frameLen/3
-    if (cells/frame[0]).is_integer() is False:
+    if frameLen % 3 != 0 or frame[0] <= 0:
         return False
-    if all(i <= 128 for i in frame[1:]) is False:
+    if (frameLen // 3) % frame[0] != 0:
         return False
-    return True
-    
+    return _packMasks(frame[1:]) is not None
+
+def _packMasks(masks):
+    # Returns masks as bytes, or None if any of them is out of range
+    try:
+        packed = bytes(masks)
+    except (ValueError, TypeError):
+        return None
+    if len(packed) > 0 and max(packed) > 128:
+        return None
+    return packed
+
+def blitFrame(baseFrame, subFrame, offset=(0,0), transparent=128):
+    """
+        Returns a copy of baseFrame with subFrame drawn over it, its top left tile
+        at offset (row, col). Whatever falls outside baseFrame is clipped, so the
+        offset can be negative. Tiles of subFrame whose red mask is transparent are
+        left showing baseFrame, pass transparent=None to copy every tile.
+        Neither frame is changed.
+    """
+    out = list(baseFrame)
+    bCols = out[0]
+    bRows = (len(out) - 1) // 3 // bCols
+    sCols = subFrame[0]
+    sRows = (len(subFrame) - 1) // 3 // sCols
+    (rowOffset, colOffset) = offset
+
+    firstCol = max(0, -colOffset)
+    lastCol = min(sCols, bCols - colOffset)
+    if firstCol >= lastCol:
+        return out
+    width = (lastCol - firstCol) * 3
+    for row in range(max(0, -rowOffset), min(sRows, bRows - rowOffset)):
+        src = 1 + (row*sCols + firstCol) * 3
+        dst = 1 + ((row+rowOffset)*bCols + firstCol + colOffset) * 3
+        masks = subFrame[src:src+width]
+        if transparent is None or transparent not in masks:
+            out[dst:dst+width] = masks
+        else:
+            for i in range(0, width, 3):
+                if masks[i] != transparent:
+                    out[dst+i:dst+i+3] = masks[i:i+3]
+    return out
+
 def mergeFrames(baseFrame, subFrame, offset=(0,0)):
-    # TODO: Alpha channel
-    rows = bRows = frameRows(baseFrame)
-    cols = bCols = baseFrame.pop(0)
-    sRows = frameRows(subFrame)
-    sCols = subFrame.pop(0)
-    if sRows+offset[0] > rows or sCols+offset[1] > cols:
+    # Kept for older code, use blitFrame
+    if frameRows(subFrame)+offset[0] > frameRows(baseFrame) or subFrame[0]+offset[1] > baseFrame[0]:
         raise Exception("Cannot merge frames, subFrame plus offset must be smaller than baseFrame")
-    out = list()
-    hiddenLayer = list()
-    out.append(cols)
-    out.extend([baseFrame.pop(0) for _ in range(offset[0]*bCols*3)])
-    while len(subFrame) > 0:
-        out.extend([baseFrame.pop(0) for _ in range(offset[1]*3)])
-        hiddenLayer.extend([baseFrame.pop(0) for _ in range(sCols*3)])
-        out.extend([subFrame.pop(0) for _ in range(sCols*3)])
-        out.extend([baseFrame.pop(0) for _ in range((bCols-sCols-offset[1])*3)])
-    out.extend(baseFrame)
-    return(out)
-
-    
+    return blitFrame(baseFrame, subFrame, offset, transparent=None)
 
 def frameRows (frame):
     return(len(frame[1:])/frame[0]/3)
@@ -141,18 +184,54 @@ def frameCols (frame):
     return(frame[0])
     
 class LSAnimation:
+    """
+        A sequence of frames of equal size. The frames are kept back to back in a
+        single bytearray, numFrames() * tiles * 3 masks long, so appending a frame
+        is cheap and getFrame() hands out a frame's masks as bytes.
+
+        Attributes:
+            rows (int):             The number of rows in each frame
+            cols (int):             The number of columns in each frame
+    """
 
     def __init__(self):
-        self._frames = list()
+        self._data = bytearray()
+        self._frameSize = 0         # Masks per frame, set by the first frame added
+
+    @property
+    def _frames(self):
+        # The frames as a sequence of list-type frames, for code written before
+        # frames were stored in an array. Every frame read from it is a new list.
+        return _FrameList(self)
 
     def numFrames(self):
-        return(len(self._frames))
+        if self._frameSize == 0:
+            return 0
+        return len(self._data) // self._frameSize
+
+    def getFrame(self, index):
+        """
+            Returns the masks of the frame at index as bytes, without the column count
+        """
+        n = self.numFrames()
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError("Frame {:d} is out of range".format(index))
+        start = index * self._frameSize
+        return bytes(self._data[start:start+self._frameSize])   # A view would stop the animation growing
+
+    def getListFrame(self, index):
+        """
+            Returns the frame at index as a list-type frame
+        """
+        masks = self.getFrame(index)    # First, animations built on demand set cols as they build
+        frame = [self.cols]
+        frame.extend(masks)
+        return frame
 
     def addFrame(self, frame):
-        if len(self._frames) is 0:
-            self.rows = int(len(frame[1:])/frame[0]/3)
-            self.cols = frame[0]
-        self.insertFrame(len(self._frames), frame)
+        self.insertFrame(self.numFrames(), frame)
         return True
 
     def insertFrame(self, index, frame):
@@ -160,21 +239,37 @@ class LSAnimation:
         if validateFrame(frame) is False:
             print("Error frame is invalid")
             raise Exception
+        masks = bytes(frame[1:])
+        if self.numFrames() == 0:
+            self.cols = frame[0]
+            self.rows = len(masks) // 3 // self.cols
+            self._frameSize = len(masks)
+        elif frame[0] != self.cols or len(masks) != self._frameSize:
+            raise ValueError("Frames in an animation must all be {:d}x{:d}".format(self.rows, self.cols))
         if self._checkIndex(index) is True:
-            self._frames.insert(index,frame)
+            n = self.numFrames()
+            if index < 0:
+                index = max(n + index, 0)
+            if index == n:
+                self._data.extend(masks)
+            else:
+                start = index * self._frameSize
+                self._data[start:start] = masks
         return True
 
     def deleteFrame(self, index):
         index -= 1
         if self._checkIndex(index) is True:
-            frames = self._frames[0:index]
-            frames.extend(self._frames[index+1:])
-            self._frames = frames
+            if index < 0:
+                index += self.numFrames()
+            start = index * self._frameSize
+            del self._data[start:start+self._frameSize]
         return True
 
     def dropFrames(self):
         # Discard all stored frames
-        self._frames = list()
+        self._data = bytearray()
+        self._frameSize = 0
 
     def showFrames(self):
         Frame = self.nextFrame()
@@ -188,55 +283,369 @@ class LSAnimation:
                 break
 
     def nextFrame(self):
-        if len(self._frames) is 0:
+        if self.numFrames() == 0:
             print("No frames!")
         else:
-            for frame in self._frames:
-                yield(frame)
-
-    def play(self, display, frameRate = 30):
-        if frameRows(self._frames[0]) > display.rows or frameCols(self._frames[0]) > display.cols:
-            raise Exception("Animation is too large for this display!")  # TODO: support clipping
-        if frameRate < 0:
-            raise ValueError("Please specify a non-negative frame rate")
-        print("Starting animation ({:d} frames at {:d} fps)".format(len(self._frames), frameRate))
-        Frame = self.nextFrame()
-        i = 0
-        for frame in Frame:
-            i+=1
-            if frameRate is 0:
-                input("Press any key to advance the animation...\n")
-                print("Frame {:d}: {:s}".format(i, str(frame)))
-            stime = time.time()
-            display.floor.renderFrame(frame)
-            display.heartbeat()
-            renderTime = time.time() - stime
-
-            if frameRate is not 0:
-                fps = 1.0/renderTime
-                if fps < frameRate:
-                    print("[Animation]{0:.4f} FPS".format(1.0/renderTime), end="\r")
-                else:
-                    time.sleep((1.0/frameRate) - renderTime)
-        if frameRate is 0:
-            print("Animation ended.")
-        print(" " * 22, end = "\r")
-
-        
+            for i in range(self.numFrames()):
+                yield(self.getListFrame(i))
+
+    def play(self, display, frameRate = 30, offset = (0,0), clip = None):
+        """
+            Plays the animation on display with its top left tile at offset (row, col).
+            Whatever falls outside the display, or outside clip, a (row, col, rows, cols)
+            rectangle of the display, is not drawn.
+        """
+        title = "Starting animation ({:d} frames at {:d} fps)".format(self.numFrames(), frameRate)
+        _playFrames(title, self.nextFrame(), display, frameRate, offset, clip)
 
     def _checkIndex(self, index):
-        if index not in range(-1,len(self._frames)+1):
+        if index not in range(-1,self.numFrames()+1):
             print("Error frame index out of range")
             raise Exception
         return True
 
+def _playFrames(title, frames, display, frameRate, offset, clip):
+    # Puts each frame on display in turn, frameRate times a second
+    if frameRate < 0:
+        raise ValueError("Please specify a non-negative frame rate")
+    print(title)
+    i = 0
+    for frame in frames:
+        i+=1
+        if frameRate is 0:
+            input("Press any key to advance the animation...\n")
+            print("Frame {:d}: {:s}".format(i, str(frame)))
+        stime = time.time()
+        display.floor.renderFrame(frame, offset, clip)
+        display.heartbeat()
+        renderTime = time.time() - stime
+
+        if frameRate is not 0:
+            if renderTime > 1.0/frameRate:     # renderTime can be 0 on a coarse clock
+                print("[Animation]{0:.4f} FPS".format(1.0/renderTime), end="\r")
+            else:
+                time.sleep((1.0/frameRate) - renderTime)
+    if frameRate is 0:
+        print("Animation ended.")
+    print(" " * 22, end = "\r")
+
+_END = object()     # Marks the end of a stream's frames
+
+class LSAnimationStream():
+    """
+        An animation whose frames are made as it plays instead of being stored, so
+        long or endless animations take the same memory as short ones.
+
+        The frames come from one of:
+            frames                  An iterable of list-type frames, or a function that
+                                    returns one. Pass a function, e.g. a generator function,
+                                    if the stream is to be played more than once.
+            callback                A function called with each frame number in turn that
+                                    returns that frame, or None once there are no more.
+
+        Up to lookahead frames are made ahead of the one being shown, in a background
+        thread, so making frames overlaps with waiting for the next one to be due.
+        With a lookahead of 0 each frame is made when it is needed.
+
+        Example:
+
+            def marquee():
+                frame = LSFrameGen(1, 8)
+                while True:
+                    frame.shiftLeft()
+                    frame.edit(0, 7, (Shapes.EIGHT, 0, 0))
+                    yield frame.get()
+
+            LSAnimationStream(marquee).play(display, frameRate=10, limit=600)
+    """
+
+    def __init__(self, frames=None, callback=None, lookahead=8):
+        if (frames is None) == (callback is None):
+            raise ValueError("Give an LSAnimationStream either frames or callback")
+        self._frames = frames
+        self._callback = callback
+        self.lookahead = lookahead
+
+    @classmethod
+    def fromAnimation(cls, animation, loop=False, lookahead=8):
+        """
+            Returns a stream of the frames of an LSAnimation, over and over if loop is True
+        """
+        def frames():
+            while True:
+                for i in range(animation.numFrames()):
+                    yield animation.getListFrame(i)
+                if not loop or animation.numFrames() == 0:
+                    return
+        return cls(frames, lookahead=lookahead)
+
+    def toAnimation(self, limit=None):
+        """
+            Returns an LSAnimation holding the stream's frames, or the first limit of
+            them. Don't call this without a limit on a stream that never ends.
+        """
+        animation = LSAnimation()
+        for frame in self.nextFrame(limit):
+            animation.addFrame(frame)
+        return animation
+
+    def _source(self):
+        # Returns a new iterator over the stream's frames
+        if self._callback is not None:
+            return self._callFrames()
+        if callable(self._frames):
+            return iter(self._frames())
+        return iter(self._frames)
+
+    def _callFrames(self):
+        i = 0
+        while True:
+            frame = self._callback(i)
+            if frame is None:
+                return
+            yield frame
+            i += 1
+
+    def nextFrame(self, limit=None):
+        """
+            Yields the stream's frames, or the first limit of them
+        """
+        if self.lookahead > 0:
+            frames = self._lookahead()
+        else:
+            frames = self._source()
+        try:
+            for (i, frame) in enumerate(frames):
+                if limit is not None and i >= limit:
+                    return
+                yield frame
+        finally:
+            if self.lookahead > 0:
+                frames.close()
+
+    def _lookahead(self):
+        # Yields frames made by a background thread which keeps at most lookahead frames waiting
+        ready = Queue(maxsize=self.lookahead)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for frame in self._source():
+                    if not put((frame, None)):
+                        return
+            except Exception as e:
+                put((_END, e))
+                return
+            put((_END, None))
+
+        producer = threading.Thread(target=produce, name="animation-lookahead")
+        producer.daemon = True
+        producer.start()
+        try:
+            while True:
+                (frame, error) = ready.get()
+                if error is not None:
+                    raise error
+                if frame is _END:
+                    return
+                yield frame
+        finally:
+            stop.set()
+
+    def play(self, display, frameRate = 30, offset = (0,0), clip = None, limit = None):
+        """
+            Plays the stream on display, see LSAnimation.play(). Stops after limit frames if limit is given.
+        """
+        title = "Starting animation stream at {:d} fps".format(frameRate)
+        _playFrames(title, self.nextFrame(limit), display, frameRate, offset, clip)
+
+
+class LSPlayback():
+    """
+        An animation started on an LSAnimator. Set by the animator, read by games:
+
+        Attributes:
+            playing (bool):         False once the animation has ended or been stopped
+            frame (list):           The frame currently shown, None before the first step
+    """
+
+    def __init__(self, animation, offset, clip, loop, priority, frameRate):
+        self.animation = animation
+        self.offset = offset
+        self.clip = clip
+        self.loop = loop
+        self.priority = priority
+        self.frameRate = frameRate
+        self.playing = True
+        self.frame = None
+        self._frames = iter(animation.nextFrame())
+        self._shown = 0
+        self._started = None
+
+    def stop(self):
+        self.playing = False
+
+    def _advance(self, now):
+        # Moves on to the frame that is due now
+        if self.frameRate is None:
+            due = self._shown + 1
+        else:
+            if self._started is None:
+                self._started = now
+            due = int((now - self._started) * self.frameRate) + 1
+        restarted = False
+        while self._shown < due:
+            try:
+                self.frame = next(self._frames)
+            except StopIteration:
+                if not self.loop or restarted:      # Ended, or there are no frames to loop over
+                    self.playing = False
+                    return
+                self._frames = iter(self.animation.nextFrame())
+                restarted = True
+                continue
+            restarted = False
+            self._shown += 1
+
+
+class LSAnimator():
+    """
+        Plays any number of animations at once, one step at a time, so playing them
+        never holds up the game that started them. LSGameEngine keeps one, steps it
+        once a frame after the game's heartbeat, and gives it to each game as
+        game.animations.
+
+        An animation can be anything with a nextFrame() generator: an LSAnimation,
+        an LSAnimationStream or an lsanimfile.LSAnimationFile. Where animations
+        overlap the one with the highest priority is drawn on top, and of those
+        with the same priority the one started last. Animations with a frame rate
+        keep to it by clock, which returns the time in seconds.
+
+        Example:
+
+            def stepOn(self, row, col):
+                self.animations.start(self.sparkle, offset=(row-1, col-1), priority=1)
+    """
+
+    def __init__(self, display, clock=time.time):
+        self.display = display
+        self.clock = clock
+        self._playbacks = list()
+        self._lock = threading.Lock()
+
+    def start(self, animation, offset=(0,0), clip=None, loop=False, priority=0, frameRate=None):
+        """
+            Starts playing animation with its top left tile at offset (row, col), and
+            returns its LSPlayback. Only the part of the floor inside clip, a (row, col,
+            rows, cols) rectangle, is drawn on. Without a frameRate the animation moves
+            on a frame every step, otherwise it keeps to frameRate whatever the step
+            rate is.
+        """
+        playback = LSPlayback(animation, offset, clip, loop, priority, frameRate)
+        with self._lock:
+            self._playbacks.append(playback)
+        return playback
+
+    def stop(self, playback=None):
+        """
+            Stops playback, or every animation if playback is None
+        """
+        with self._lock:
+            if playback is None:
+                stopping = self._playbacks
+                self._playbacks = list()
+            else:
+                stopping = [playback]
+        for p in stopping:
+            p.stop()
+
+    def playing(self):
+        """
+            Returns the LSPlayback of each animation still playing
+        """
+        with self._lock:
+            return [p for p in self._playbacks if p.playing]
+
+    def step(self):
+        """
+            Moves every animation on to its next frame and draws them on the display
+        """
+        now = self.clock()
+        with self._lock:
+            playbacks = list(self._playbacks)
+        for p in playbacks:
+            if p.playing:
+                p._advance(now)
+        with self._lock:
+            self._playbacks = [p for p in self._playbacks if p.playing]
+        shown = sorted((p for p in playbacks if p.playing and p.frame is not None), key=lambda p: p.priority)
+        if len(shown) == 1:
+            self.display.floor.renderFrame(shown[0].frame, shown[0].offset, shown[0].clip)
+        elif len(shown) > 1:
+            self.display.floor.renderFrame(self._composite(shown))
+
+    def _composite(self, shown):
+        # Returns a frame the size of the floor with each animation drawn over the ones before it
+        (rows, cols) = (self.display.rows, self.display.cols)
+        out = [cols] + [128] * (rows*cols*3)
+        for p in shown:
+            (rowOffset, colOffset) = p.offset
+            if p.clip is None:
+                out = blitFrame(out, p.frame, p.offset)
+                continue
+            (clipRow, clipCol, clipRows, clipCols) = p.clip
+            if clipRows > 0 and clipCols > 0:
+                window = [clipCols] + [128] * (clipRows*clipCols*3)
+                window = blitFrame(window, p.frame, (rowOffset-clipRow, colOffset-clipCol))
+                out = blitFrame(out, window, (clipRow, clipCol))
+        return out
+
+
+class _FrameList():
+    # A read-only sequence of an LSAnimation's frames as list-type frames
+
+    def __init__(self, animation):
+        self.animation = animation
+
+    def __len__(self):
+        return self.animation.numFrames()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.animation.getListFrame(i) for i in range(*index.indices(len(self)))]
+        return self.animation.getListFrame(index)
+
+    def __iter__(self):
+        return (self.animation.getListFrame(i) for i in range(len(self)))
+
+# How many built ScrollingText animations are kept for reuse
+SCROLLING_TEXT_CACHE_SIZE = 32
+_scrollingTextCache = OrderedDict()
+_scrollingTextLock = threading.Lock()      # Screensavers build their text in the background
+
 class ScrollingText(LSAnimation):
+    """
+        An animation of text scrolling across a row of tiles. The frames are only
+        built when they are first asked for, after the text's settings last changed.
+        Built frames are shared by every ScrollingText with the same text, colors,
+        size, direction and iterations.
+    """
 
     height = 1
     width = 1
     color = Colors.WHITE
     direction = "left"
     iterations = 1
+    _stale = True
 
     def __init__(self, text, color=Colors.WHITE, height=1, width=None):
         super().__init__()
@@ -252,35 +661,72 @@ class ScrollingText(LSAnimation):
     def __setattr__ (self, name, value):
         super().__setattr__(name, value)
         if name in ["height", "width", "color", "direction", "iterations"]:
+            self._stale = True
+
+    def numFrames(self):
+        if self._stale:
             self._buildAnimation()
+        return super().numFrames()
+
+    def getFrame(self, index):
+        if self._stale:
+            self._buildAnimation()
+        return super().getFrame(index)
+
+    def _colors(self):
+        # The color of each character in the order they scroll on. A color that
+        # is an iterator, like Colors.RAINBOW(), gives each character the next color
+        colors = list()
+        for _ in range(self.iterations):
+            for char in self.charString:
+                try:
+                    colors.append(next(self.color))
+                except TypeError:
+                    colors.append(self.color)
+        return colors
 
     def _buildAnimation (self):
+        self._stale = False
+        if self.height != 1:
+            raise NotImplementedError("height cannot be more than 1")
+        colors = self._colors()
+        key = (tuple(self.charString), tuple(colors), self.width, self.height, self.direction.lower(), self.iterations)
+        with _scrollingTextLock:
+            cached = _scrollingTextCache.pop(key, None)
+        if cached is not None:
+            (data, rows, cols) = cached
+            self._data = bytearray(data)
+            self._frameSize = rows*cols*3 if len(data) > 0 else 0
+            (self.rows, self.cols) = (rows, cols)
+        else:
+            self._renderText(colors)
+            (data, rows, cols) = (bytes(self._data), getattr(self, "rows", 0), getattr(self, "cols", 0))
+        with _scrollingTextLock:
+            while len(_scrollingTextCache) >= SCROLLING_TEXT_CACHE_SIZE:
+                _scrollingTextCache.popitem(last=False)
+            _scrollingTextCache[key] = (data, rows, cols)
+
+    def _renderText(self, colors):
         self.dropFrames()
         self.frame = LSFrameGen(self.height, self.width)
         cs = self.charString[:]
         if "right" in self.direction.lower():
-            cs = reversed(cs)
-        if self.height is 1:
-            endCap = lambda x: self.width-1 if "left" in x.lower() else 0
-            for i in range(0,self.iterations):
-                for char in cs:
-                    try:
-                        color = next(self.color)
-                    except TypeError:
-                        color = self.color
-                    colorMask = Colors.intToRGB(color)
-                    charR = charG = charB = 0
-                    (charR, charG, charB) = [char if i is not 0 else 0 for i in colorMask]
-                    self.frame.edit(0, endCap(self.direction), (charR, charG, charB))
+            cs.reverse()
+        colors = iter(colors)
+        endCap = lambda x: self.width-1 if "left" in x.lower() else 0
+        for i in range(0,self.iterations):
+            for char in cs:
+                colorMask = Colors.intToRGB(next(colors))
+                charR = charG = charB = 0
+                (charR, charG, charB) = [char if i is not 0 else 0 for i in colorMask]
+                self.frame.edit(0, endCap(self.direction), (charR, charG, charB))
+                self.addFrame(self.frame.get())
+                self._pickShift()
+            if True:
+                for i in range(0,self.width):
+                    self.frame.edit(0, endCap(self.direction), (0, 0, 0))
                     self.addFrame(self.frame.get())
                     self._pickShift()
-                if True:
-                    for i in range(0,self.width):
-                        self.frame.edit(0, endCap(self.direction), (0, 0, 0))
-                        self.addFrame(self.frame.get())
-                        self._pickShift()
-        else:
-            raise NotImplementedError("height cannot be more than 1")
 
 
     def _pickShift(self):
@@ -293,76 +739,135 @@ class ScrollingText(LSAnimation):
 
 
 class LSFrameGen:
+    """
+        A frame being drawn. The masks are kept in one bytearray, rows * cols * 3
+        long, laid out just like a list-type frame after its column count, so shifts,
+        flips and rotations are a few slice moves whatever the size of the frame.
+        Tiles that have not been edited have no update (a red mask of 128), tiles
+        shifted in are blank.
+    """
 
     def __init__(self, rows, cols):
         self.rows = rows
         self.cols = cols
-        self.frame = defaultdict(lambda: defaultdict(int))
+        self._cells = bytearray([128]) * (rows * cols * 3)
 
     # Allows you to edit an existing frame structure, if no colormask is set
     # then the tile will keep its current colormask
     def edit(self, row, col, colormask):
-        if row > self.rows or col > self.cols:
+        if row < 0 or col < 0 or row >= self.rows or col >= self.cols:
             print("Edit error, index out of range")
             raise Exception
-        self.frame[row][col] = [colormask]
+        i = (row*self.cols + col) * 3
+        self._cells[i:i+3] = bytes(colormask)
 
     def fill(self, colormask):
-        for row in range(0, self.rows):
-            for col in range(0, self.cols):
-                self.frame[row][col] = [colormask]
+        self._cells[:] = bytes(colormask) * (self.rows * self.cols)
+
+    def shift (self, rows=0, cols=0):
+        """
+            Moves every tile down by rows and right by cols, negative values move them
+            up and left. Pass both for a diagonal shift. Tiles moved off the frame are
+            lost and the ones left behind are blanked.
+        """
+        rowSize = self.cols * 3
+        cells = self._cells
+        size = len(cells)
+        if abs(rows) >= self.rows or abs(cols) >= self.cols:
+            cells[:] = bytes(size)
+            return
+        if rows > 0:
+            cells[rows*rowSize:] = cells[:size - rows*rowSize]
+            cells[:rows*rowSize] = bytes(rows*rowSize)
+        elif rows < 0:
+            cells[:size + rows*rowSize] = cells[-rows*rowSize:]
+            cells[size + rows*rowSize:] = bytes(-rows*rowSize)
+        if cols != 0:
+            # Moving the whole array carries tiles across the ends of the rows, the
+            # columns they land in are then blanked
+            if cols > 0:
+                cells[cols*3:] = cells[:size - cols*3]
+                blanked = range(cols)
+            else:
+                cells[:size + cols*3] = cells[-cols*3:]
+                blanked = range(self.cols + cols, self.cols)
+            column = bytes(self.rows)
+            for col in blanked:
+                for k in range(3):
+                    cells[col*3 + k::rowSize] = column
 
     def shiftLeft (self):
-        for col in range(0, self.cols-1):
-            for row in range(0, self.rows):
-                self.frame[row][col] = self.frame[row][col+1]
-        for row in range(0, self.rows):
-            self.frame[row][self.cols-1] = [(0,0,0)]
+        self.shift(cols=-1)
 
     def shiftRight (self):
-        for col in reversed(range(0, self.cols)):
-            for row in range(0, self.rows):
-                self.frame[row][col] = self.frame[row][col-1]
-        for row in range(0, self.rows):
-            self.frame[row][0] = [(0,0,0)]
+        self.shift(cols=1)
 
     def shiftUp (self):
-        for row in range(0, self.rows-1):
-            for col in range(0, self.cols):
-                self.frame[row][col] = self.frame[row+1][col]
-        for col in range(0, self.cols):
-            self.frame[self.rows-1][col] = [(0,0,0)]
+        self.shift(rows=-1)
 
     def shiftDown (self):
-        for row in reversed(range(0, self.rows)):
-            for col in range(0, self.cols):
-                self.frame[row][col] = self.frame[row-1][col]
-        for col in range(0, self.cols):
-            self.frame[0][col] = [(0,0,0)]
-
-#TODO: (shiftDiag?)
-
-
+        self.shift(rows=1)
+
+    def flipHorizontal (self):
+        # Mirrors the frame left to right
+        rowSize = self.cols * 3
+        cells = self._cells
+        for start in range(0, len(cells), rowSize):
+            row = cells[start:start+rowSize]
+            for k in range(3):
+                row[k::3] = row[k::3][::-1]
+            cells[start:start+rowSize] = row
+
+    def flipVertical (self):
+        # Mirrors the frame top to bottom
+        rowSize = self.cols * 3
+        cells = self._cells
+        cells[:] = b"".join(cells[start:start+rowSize] for start in reversed(range(0, len(cells), rowSize)))
+
+    def rotate (self, turns=1):
+        """
+            Turns the frame clockwise by 90 degrees, turns times; negative turns go
+            anticlockwise. A quarter turn swaps rows and cols.
+        """
+        turns %= 4
+        if turns == 2:
+            self.flipVertical()
+            self.flipHorizontal()
+            return
+        if turns == 0:
+            return
+        rowSize = self.cols * 3
+        cells = self._cells
+        out = bytearray(len(cells))
+        outRowSize = self.rows * 3
+        for col in range(self.cols):
+            # A column of the old frame becomes a row of the new one
+            outRow = bytearray(outRowSize)
+            for k in range(3):
+                column = cells[col*3 + k::rowSize]
+                outRow[k::3] = column[::-1] if turns == 1 else column
+            newRow = col if turns == 1 else self.cols - 1 - col
+            out[newRow*outRowSize:(newRow+1)*outRowSize] = outRow
+        self._cells = out
+        (self.rows, self.cols) = (self.cols, self.rows)
 
     def print(self):
-        for row in self.frame:
-            print([self.frame[row][col] for col in self.frame[row]])
+        rowSize = self.cols * 3
+        for start in range(0, len(self._cells), rowSize):
+            row = self._cells[start:start+rowSize]
+            print([tuple(row[i:i+3]) for i in range(0, rowSize, 3)])
+
+    def view(self):
+        """
+            Returns the masks as a memoryview, without the column count and without
+            copying them. The view shows later edits, up until a quarter turn of
+            rotate() gives the frame new storage.
+        """
+        return memoryview(self._cells)
 
     def get(self):
-        frameOut = list()
-        frameOut.append(self.cols)
-        for row in range(0, self.rows):
-            for col in range(0, self.cols):
-                try:
-                    cell = self.frame[row][col][0]
-                    frameOut.append(cell[0])
-                    frameOut.append(cell[1])
-                    frameOut.append(cell[2])
-                except:
-                #    print("Warning: ({:d},{:d}) has no update".format(row,col)) # Debugging
-                    frameOut.append(128)
-                    frameOut.append(128)
-                    frameOut.append(128)
+        frameOut = [self.cols]
+        frameOut.extend(self._cells)
         return(frameOut)  # frameOut is a list consisting of the number of columns in the frame
                           # followed by a repeating pattern of 3 integers, each representing a
                           # subsequent tile's red, green, and blue colormasks
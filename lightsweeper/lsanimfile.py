@@ -0,0 +1,220 @@
+""" Saves LightSweeper animations to disk and plays them back from there
+
+An animation file starts with a header, followed by one record per frame and an
+index of where each record starts. Every few frames, or whenever it would be
+smaller than the changes since the last frame, a record is a keyframe holding the
+masks of every tile. The others are deltas listing only the tiles that changed,
+packed the same way lsnetwork packs tiles. Everything is in network byte order.
+
+    header      magic "LSAN", version, rows, cols, frame rate, number of frames,
+                offset of the index
+    keyframe    KEYFRAME, then rows*cols*3 masks
+    delta       DELTA, the number of tiles that changed, then a
+                (row, col, red, green, blue) record for each of them
+    index       for every frame, the offset of its record and the number of
+                the keyframe it builds on
+
+Files are read through mmap, so opening one costs the same however long the
+animation is. Keyframes are copied straight out of the file and playing a file
+only ever applies one delta per frame.
+
+Example:
+
+    from lightsweeper import lsanimfile
+
+    lsanimfile.saveAnimation(ourAnimation, "stripes.lsa", frameRate=10)
+
+    with lsanimfile.LSAnimationFile("stripes.lsa") as stripes:
+        stripes.play(ourDisplay)
+"""
+
+from lightsweeper.lsanimate import LSAnimation
+from lightsweeper.lsanimate import _playFrames
+from lightsweeper import lsnetwork
+
+import mmap
+import struct
+
+MAGIC = b"LSAN"
+VERSION = 1
+
+HEADER = struct.Struct("!4sBHHHIQ")     # magic, version, rows, cols, frame rate, frames, index offset
+RECORD = struct.Struct("!B")            # record type
+COUNT = struct.Struct("!I")             # number of tiles in a delta
+INDEX = struct.Struct("!QI")            # record offset, number of the keyframe it builds on
+
+# Record types
+KEYFRAME = 1
+DELTA = 2
+
+# A keyframe is written at least this often, so seeking never applies more deltas than this
+KEYFRAME_INTERVAL = 30
+
+
+class BadAnimationFile(IOError):
+    """ Custom exception returned when a file is not an animation file this module can read. """
+    pass
+
+
+def saveAnimation(animation, path, frameRate=30, keyframeInterval=KEYFRAME_INTERVAL):
+    """
+        Writes the frames of animation to path and returns the number of frames
+        written. animation can be anything with a nextFrame() generator, such as an
+        LSAnimation or an LSAnimationStream (which should have an end).
+    """
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0, frameRate, 0, 0))
+        index = list()
+        last = None
+        keyframe = 0
+        (rows, cols) = (0, 0)
+        for frame in animation.nextFrame():
+            masks = bytes(frame[1:])
+            if last is None:
+                cols = frame[0]
+                rows = len(masks) // 3 // cols
+            elif len(masks) != len(last):
+                raise ValueError("Frames in an animation must all be {:d}x{:d}".format(rows, cols))
+            offset = f.tell()
+            changed = None
+            if last is not None and len(index) - keyframe < keyframeInterval:
+                changed = [(i//3 // cols, i//3 % cols, tuple(masks[i:i+3]))
+                           for i in range(0, len(masks), 3) if masks[i:i+3] != last[i:i+3]]
+                if COUNT.size + len(changed)*lsnetwork.TILE.size >= len(masks):
+                    changed = None      # A keyframe is smaller
+            if changed is None:
+                keyframe = len(index)
+                f.write(RECORD.pack(KEYFRAME) + masks)
+            else:
+                f.write(RECORD.pack(DELTA) + COUNT.pack(len(changed)))
+                f.write(b"".join(lsnetwork.TILE.pack(row, col, r, g, b) for (row, col, (r, g, b)) in changed))
+            index.append((offset, keyframe))
+            last = masks
+        indexOffset = f.tell()
+        f.write(b"".join(INDEX.pack(offset, key) for (offset, key) in index))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, frameRate, len(index), indexOffset))
+    return len(index)
+
+def loadAnimation(path):
+    """
+        Reads an animation file into a new LSAnimation
+    """
+    with LSAnimationFile(path) as animationFile:
+        return animationFile.toAnimation()
+
+
+class LSAnimationFile():
+    """
+        An animation file opened for playback.
+
+        Attributes:
+            rows (int):             The number of rows in each frame
+            cols (int):             The number of columns in each frame
+            frameRate (int):        The frame rate the animation was saved with
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, version, self.rows, self.cols, self.frameRate, self._numFrames, self._indexOffset) = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise BadAnimationFile("{:s} is too short to be an animation file".format(path))
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise BadAnimationFile("{:s} is not a version {:d} animation file".format(path, VERSION))
+        self._frameSize = self.rows * self.cols * 3
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        try:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+        finally:
+            self._file.close()
+
+    def numFrames(self):
+        return self._numFrames
+
+    def _index(self, i):
+        return INDEX.unpack_from(self._map, self._indexOffset + i*INDEX.size)
+
+    def _keyframe(self, offset):
+        # Returns a view of the masks of the keyframe at offset, straight from the file
+        start = offset + RECORD.size
+        return memoryview(self._map)[start:start+self._frameSize]
+
+    def _applyDelta(self, masks, offset):
+        # Applies the delta at offset to masks, a bytearray
+        (count,) = COUNT.unpack_from(self._map, offset + RECORD.size)
+        start = offset + RECORD.size + COUNT.size
+        for (row, col, r, g, b) in lsnetwork.TILE.iter_unpack(self._map[start:start + count*lsnetwork.TILE.size]):
+            i = (row*self.cols + col) * 3
+            masks[i:i+3] = bytes((r, g, b))
+
+    def getFrame(self, index):
+        """
+            Returns the masks of the frame at index as bytes, without the column count.
+            A keyframe is copied from the file, anything else is built from the keyframe
+            before it.
+        """
+        if index < 0:
+            index += self._numFrames
+        if index < 0 or index >= self._numFrames:
+            raise IndexError("Frame {:d} is out of range".format(index))
+        (offset, keyframe) = self._index(index)
+        if keyframe == index:
+            return bytes(self._keyframe(offset))    # A view would keep the file from closing
+        masks = bytearray(self._keyframe(self._index(keyframe)[0]))
+        for i in range(keyframe+1, index+1):
+            self._applyDelta(masks, self._index(i)[0])
+        return bytes(masks)
+
+    def nextFrame(self):
+        """
+            Yields every frame in turn as a list-type frame
+        """
+        masks = bytearray(self._frameSize)
+        offset = HEADER.size
+        for _ in range(self._numFrames):
+            (kind,) = RECORD.unpack_from(self._map, offset)
+            if kind == KEYFRAME:
+                masks[:] = self._keyframe(offset)
+                offset += RECORD.size + self._frameSize
+            elif kind == DELTA:
+                self._applyDelta(masks, offset)
+                (count,) = COUNT.unpack_from(self._map, offset + RECORD.size)
+                offset += RECORD.size + COUNT.size + count*lsnetwork.TILE.size
+            else:
+                raise BadAnimationFile("Unknown record type {:d} in {:s}".format(kind, self.path))
+            frame = [self.cols]
+            frame.extend(masks)
+            yield frame
+
+    def toAnimation(self):
+        """
+            Returns a new LSAnimation holding every frame of the file
+        """
+        animation = LSAnimation()
+        for frame in self.nextFrame():
+            animation.addFrame(frame)
+        return animation
+
+    def play(self, display, frameRate = None, offset = (0,0), clip = None):
+        """
+            Plays the file on display at the frame rate it was saved with, see LSAnimation.play()
+        """
+        if frameRate is None:
+            frameRate = self.frameRate
+        title = "Starting animation ({:d} frames at {:d} fps)".format(self._numFrames, frameRate)
+        _playFrames(title, self.nextFrame(), display, frameRate, offset, clip)
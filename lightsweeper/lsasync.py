@@ -0,0 +1,282 @@
+""" Runs LightSweeper games on a single asyncio event loop instead of a handful of threads
+
+LSAsyncGameEngine is an LSGameEngine whose floor starts none of its own I/O
+threads. Instead everything is a task on one event loop:
+
+    the game loop           ticks on the same schedule as LSGameEngine, awaiting the
+                            game's heartbeat if it is a coroutine
+    sensor events           views are polled on the loop and what they see arrives as
+                            an async stream, see sensorEvents()
+    serial sweeps           one task per port reads its tiles, one tile at a time
+    the cartridge reader    an LSRFID(threaded=False) is read as its port becomes readable
+    audio fades             run as tasks rather than threads of their own
+    the FPS line            printed by a task
+
+Games don't need to change, but may define their heartbeat with async def:
+
+    class Slow(LSGame):
+        async def heartbeat(self, sensorsChanged):
+            await asyncio.sleep(0)      # Let the sensor tasks in
+
+    LSAsyncGameEngine(Slow).beginLoop()
+
+A serial read blocks the loop for as long as a tile takes to answer, at most the
+port's timeout, which is why the sweeps yield after every tile. Views that sleep
+or block waiting for events (LSNullFloor, the mirror, sharded and I/O process
+floors) are polled on the loop's executor instead.
+"""
+
+import asyncio
+import inspect
+import threading
+
+from lightsweeper.lscartridge import getLine
+from lightsweeper.lsgame import LSGameEngine
+from lightsweeper.lsgame import SAVERS
+from lightsweeper.lsgame import STATUS_INTERVAL
+from lightsweeper.lsgame import _StatusLine
+
+POLL_REST = 0.002       # Seconds to rest when no view had anything to say
+
+
+class LSAsyncGameEngine(LSGameEngine):
+    """
+        An LSGameEngine that runs the game, the floor's I/O, the cartridge reader and
+        audio fades as tasks on a single asyncio event loop. It takes the same
+        arguments; beginLoop() runs the loop until the game is over, or await main()
+        from a loop of your own.
+
+        Attributes:
+            eventLoop (AbstractEventLoop):  The loop the engine is running on, None until it starts
+            tasks (set):                    The engine's tasks that are still running
+    """
+
+    THREADED = False
+
+    def __init__(self, *args, **kwargs):
+        self.eventLoop = None
+        self.tasks = set()
+        self._wake = None
+        super().__init__(*args, **kwargs)
+        self.audio.background = self._background
+
+    def beginLoop(self, plays = 0):
+        asyncio.run(self.main(plays))
+
+    async def main(self, plays = 0):
+        """
+            Starts the engine's tasks and runs games until plays games have been played,
+            or forever if plays is 0
+        """
+        self.eventLoop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        floor = self.display.floor
+        self.spawn(self._handleSensorEvents())
+        for view in floor.views:
+            if view.pollBlocks:
+                self.spawn(self._pollInExecutor(view))
+            for monitor in getattr(view, "monitors", ()):
+                self.spawn(self._sweep(view, monitor))
+        if getattr(self.cartridgeReader, "threaded", True) is False:
+            self.spawn(self._readCartridge(self.cartridgeReader))
+        self.spawn(self._statusLine())
+        try:
+            while plays == 0 or self.numPlays <= plays:
+                await self.tick()
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            self.eventLoop = None
+        self.insertCoin()
+
+    def spawn(self, coroutine):
+        """
+            Runs coroutine as one of the engine's tasks
+        """
+        task = self.eventLoop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self._taskDone)
+        return task
+
+    def _taskDone(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print("WARNING: LSAsyncGameEngine task failed: {:s}".format(repr(task.exception())))
+
+    async def tick(self):
+        """
+            Runs one tick, the same as LSGameEngine.enterFrame()
+        """
+        (stats, startEnterFrame) = self._startTick()
+        if not self.game.ended:
+            beat = self.game.heartbeat(self.moves)
+            if inspect.isawaitable(beat):
+                await beat
+            self._output(stats, startEnterFrame)
+        else:
+            self.newGame(SAVERS)
+        if self.game.frameRate == 0:
+            await self._pause()
+        pause = self._endTick(stats, startEnterFrame)
+        startSleep = self.clock()
+        if await self._sleep(pause):
+            self._nextTick = None           # Woken from idle, don't wait out the rest of the idle schedule
+        stats.record("sleep", self.clock() - startSleep)
+
+    async def _pause(self):
+        # Steps keep arriving while the game is paused, so one of them can resume it
+        print("Game is paused.")
+        while self.game.frameRate == 0:
+            await asyncio.sleep(POLL_REST)
+        print("Game resuming...")
+        self._nextTick = None           # Start a new schedule after a pause
+
+    async def _sleep(self, seconds):
+        # Waits for the next tick, like LSGovernor.wait() a step that wakes the floor
+        # from idle cuts the wait short. Returns True if it was cut short.
+        if seconds <= 0 or self.governor is None:
+            await asyncio.sleep(max(seconds, 0))
+            return False
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            return False
+        self._wake.clear()
+        return True
+
+    def handleTileStepEvent(self, row, col, sensorPcnt):
+        wasIdle = self.governor is not None and self.governor.idle
+        super().handleTileStepEvent(row, col, sensorPcnt)
+        if wasIdle and not self.governor.idle and self._wake is not None:
+            self._wake.set()
+
+    def newGame(self, Game):
+        super().newGame(Game)
+        self.game.pumpEvents = self.pumpEvents
+
+    def _collect(self):
+        # Polls the views that don't block until they run dry, then returns what reached the root floor
+        floor = self.display.floor
+        for view in floor.views:
+            if not view.pollBlocks:
+                while len(view.io.poll()) > 0:
+                    pass
+        events = list()
+        while not floor._events.empty():
+            events.append(floor._events.get_nowait())
+        return events
+
+    async def sensorEvents(self):
+        """
+            Yields (row, col, sensor-percent) every time a view sees a tile's sensor change
+        """
+        floor = self.display.floor
+        while True:
+            events = self._collect()
+            for event in events:
+                yield event
+            if len(events) == 0:
+                await asyncio.sleep(max(floor.pollInterval, POLL_REST))
+
+    def pumpEvents(self):
+        """
+            Hands any new events to the game straight away, for games that wait for
+            steps without returning from their heartbeat
+        """
+        for event in self._collect():
+            self.display.floor.eventHandler.handle(event)
+
+    async def _handleSensorEvents(self):
+        async for event in self.sensorEvents():
+            self.display.floor.eventHandler.handle(event)
+
+    async def _pollInExecutor(self, view):
+        # Views that block while polling get their events on the loop's executor
+        while True:
+            await self.eventLoop.run_in_executor(None, view.io.poll)
+
+    async def _sweep(self, view, monitor):
+        # Reads every tile on one port, the same as an LSRealFloor event monitor thread
+        while True:
+            for tile in monitor.tiles:
+                monitor.read(tile)
+                await asyncio.sleep(0)
+            view._flushCalibration()
+            await asyncio.sleep(view._root.pollInterval)
+
+    async def _readCartridge(self, reader):
+        lines = _SerialLines(self.eventLoop, reader.serial)
+        parser = reader.parser()
+        request = next(parser)
+        while True:
+            if request is None:
+                request = parser.send(await lines.get())
+            else:
+                await asyncio.sleep(request)
+                request = parser.send(None)
+
+    async def _statusLine(self):
+        status = _StatusLine(self)
+        while True:
+            await asyncio.sleep(STATUS_INTERVAL)
+            status.show()
+
+    def _background(self, steps):
+        # Runs audio work as a task, it can be asked for from any thread
+        if self.eventLoop is None:
+            type(self.audio).background(self.audio, steps)     # Not running yet, fall back on a thread
+        else:
+            self.eventLoop.call_soon_threadsafe(self.spawn, _runSteps(steps))
+
+
+async def _runSteps(steps):
+    for seconds in steps:
+        await asyncio.sleep(seconds)
+
+
+class _SerialLines():
+    # The lines a pyserial port receives. Where the port has a file descriptor they
+    # are read as it becomes readable, elsewhere one line at a time on the executor.
+
+    def __init__(self, eventLoop, port):
+        self.eventLoop = eventLoop
+        self.port = port
+        self.lines = asyncio.Queue()
+        self.buffer = b""
+        self.fd = None
+        self._watch()
+
+    def _watch(self):
+        try:
+            fd = self.port.fileno()
+            self.eventLoop.add_reader(fd, self._readable)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            fd = None
+        self.fd = fd
+
+    def _readable(self):
+        try:
+            self.buffer += self.port.read(self.port.in_waiting or 1)
+        except (OSError, ValueError):
+            self.eventLoop.remove_reader(self.fd)    # The port was closed, get() watches it again
+            return
+        lines = self.buffer.split(b"\n")
+        self.buffer = lines.pop()
+        for line in lines:
+            try:
+                self.lines.put_nowait(line[:-1].decode("ASCII"))
+            except UnicodeDecodeError:
+                self.lines.put_nowait("DEADBEEF")   # The same hack as getLine()
+
+    async def get(self):
+        if self.fd is None:
+            return await self.eventLoop.run_in_executor(None, getLine, self.port)
+        try:
+            fd = self.port.fileno()
+        except (OSError, ValueError):
+            fd = None
+        if fd != self.fd:                           # The reader reopened its port
+            self.eventLoop.remove_reader(self.fd)
+            self.buffer = b""
+            self._watch()
+        return await self.lines.get()
@@ -13,6 +13,10 @@ from collections import OrderedDict
 from lightsweeper.lsconfig import userSelect
 from lightsweeper import lsconfig
 
+def _runSteps(steps):
+    for seconds in steps:
+        time.sleep(seconds)
+
 class _lsAudio:
 
 
@@ -68,6 +72,13 @@ class _lsAudio:
     def setSoundVolume(self, vol):
         self.soundVolume = vol
 
+    def background(self, steps):
+        """
+            Runs steps, a generator that yields the seconds to wait between its steps,
+            on a thread of its own. lsasync replaces this with one that runs it as a task.
+        """
+        start_new_thread(_runSteps, (steps,))
+
     def _locateSound(self, filename):
         relativeSounds = os.path.abspath(sys.path[0])
         gameSounds = os.path.join(self.conf["GAMESDIR"], "sounds")
@@ -175,25 +186,25 @@ class _pygameAudio(_lsAudio):
         else:
             pygame.mixer.music.play(loops=loops)
         if fadeIn:
-            start_new_thread(self._fadeInMusic, (fadeIn,))
+            self.background(self._fadeInMusic(fadeIn))
 
     def _fadeInMusic (self, fadeInTime):
         targetVolume = self.musicVolume
         volumeIncrement = targetVolume/fadeInTime
         for i in range(fadeInTime):
             self.setMusicVolume(volumeIncrement * i)
-            time.sleep(.001)
+            yield .001
 
     def _fadeOutMusic (self, fadeOutTime):
         volumeDecrement = self.musicVolume/fadeOutTime
         for i in reversed(range(fadeOutTime)):
             self.setMusicVolume(volumeDecrement * i)
-            time.sleep(.001)
+            yield .001
         pygame.mixer.music.pause()
 
     def _stopMusic(self, fadeOut):
         if fadeOut > 0:
-            start_new_thread(self._fadeOutMusic, (fadeOut,))
+            self.background(self._fadeOutMusic(fadeOut))
         else:
             pygame.mixer.music.pause()
 
@@ -252,14 +263,51 @@ class _pygameAudio(_lsAudio):
         self.midi_out.note_on(note,int(self.soundVolume * 127))
 
 
+class _silentAudio(_lsAudio):
+    # Accepts every request and plays nothing
+
+    def _init(self):
+        pass
+
+    def _loadMusic(self, filename):
+        pass
+
+    def _playMusic(self, loops=-1, fadeIn=False):
+        pass
+
+    def _stopMusic(self, fadeOut):
+        pass
+
+    def _setMusicVolume(self, vol):
+        pass
+
+    def _loadSound(self, filename, name):
+        self.sounds[name] = filename
+
+    def _playSound(self, name, custom_relative_volume=-1):
+        pass
+
+    def _stopSounds(self):
+        pass
+
+    def _setSoundVolume(self, vol):
+        pass
+
+
 try:
     import pygame
     import pygame.mixer
     lsAudioBackend = _pygameAudio
 except:
-    lsAudioBackend = _lsAudio
+    lsAudioBackend = _silentAudio
     print("No sound platform installed. Make sure pygame is installed with sdl mixer support.")
 
 #this class serves as a common controller for audio
 class LSAudio(lsAudioBackend):
     pass
+
+class LSSilentAudio(_silentAudio):
+    """
+        An LSAudio that never makes a sound, for running games where nobody is listening
+    """
+    pass
@@ -22,10 +22,11 @@ class LSRFID:
 
     """
         This class provides methods for interacting with LightSweeper
-        RFID based cartridges.
+        RFID based cartridges. Pass threaded=False to read the reader's
+        responses yourself, by feeding lines to parser(), see lsasync.
     """
 
-    def __init__(self):
+    def __init__(self, threaded=True):
 
         self.resetState()
 
@@ -38,9 +39,11 @@ class LSRFID:
         self._pyserial = serial
         self._list_ports = list_ports
         self.serial = self.findReader()
-        d = threading.Thread(name='cartParserd', target=self.cartParser)
-        d.setDaemon(True)
-        d.start()
+        self.threaded = threaded
+        if threaded:
+            d = threading.Thread(name='cartParserd', target=self.cartParser)
+            d.setDaemon(True)
+            d.start()
 
 
     def resetState(self):
@@ -102,14 +105,29 @@ class LSRFID:
             self.serial.write(char.encode())
 
     def cartParser(self):
+        parser = self.parser()
+        request = next(parser)
         while True:
-            response = getLine(self.serial).split(" ")
+            if request is None:
+                request = parser.send(getLine(self.serial))
+            else:
+                time.sleep(request)
+                request = parser.send(None)
+
+    def parser(self):
+        """
+            A generator that parses the reader's responses. It yields None when it
+            wants the next line from the reader to be sent to it, or a number of
+            seconds to wait before it is sent None and carries on.
+        """
+        while True:
+            response = (yield).split(" ")
       #      print(" ".join(response)) # Debugging
             if response[0] == "CART":
                 if response[1] == "INSERTED":
                     self.gameID = int("".join(response[2:]), 16)
                     self.gameRunning = True
-                    time.sleep(1) # Give the reader a chance to initialize its internals
+                    yield 1 # Give the reader a chance to initialize its internals
                     self.sendScoresRequest()
                 elif response[1] == "PULLED":
                     self.resetState()
@@ -121,7 +139,7 @@ class LSRFID:
                 numScores, totalScores = response[0].split("/")
                 scores = defaultdict(list)
                 for i in range(int(numScores)):
-                    name, score = getLine(self.serial).split()
+                    name, score = (yield).split()
                     scores[int(score)].append(name)
             #    self.scores = OrderedDict(sorted(scores.items(), reverse = True))
                 self.scores = scores
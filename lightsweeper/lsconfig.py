@@ -129,6 +129,10 @@ class LSFloorConfig:
                                     containing a tuple of the corresponding tile's port and address
             calibrationMap(dict):   A map keyed by the tuple (address,port) to another tuple containing
                                     low and high observed readings from the tile's touch sensor
+            shards (str):           The FLOORSHARDS directive, if set the floor's ports are driven by
+                                    lsshard worker processes
+            ioProcess (bool):       Set by the IOPROCESS directive, if True the floor's serial I/O runs
+                                    in its own process (see lsprocess)
     """
 
     fileName = None
@@ -138,10 +142,14 @@ class LSFloorConfig:
     config = list()
     board = defaultdict(lambda: defaultdict(int))
     calibrationMap = dict()
+    shards = None
+    ioProcess = False
 
     def __init__(self, configFile=None, rows=None, cols=None):
 
         conf = readConfiguration()
+        self.shards = conf.get("FLOORSHARDS")
+        self.ioProcess = conf.get("IOPROCESS", "no").lower() in ("yes", "true", "1")
         try:
             self.floorDir = conf["FLOORSDIR"]
         except KeyError:
@@ -210,6 +218,8 @@ class LSFloorConfig:
                 self._parseConfig(self.config)
             except Exception as e:
                 raise CannotParseError("Parsing of {:s} failed: {s}".format(fileName, e))
+            if self.loadJournal() > 0:
+                self._storeCalibration()
             print("Loaded {:d} rows and {:d} columns ({:d} tiles)".format(self.rows, self.cols, self.cells))
             return True
 
@@ -272,6 +282,66 @@ class LSFloorConfig:
                 message = "Your configuration was saved in {:s}".format(self.fileName)
         print(message)
 
+    def journalFileName(self):
+        """
+            Returns the name of the calibration journal that sits next to the config file
+        """
+        if self.fileName is None:
+            raise IOError("fileName must be set before the calibration journal can be used.")
+        return self.fileName + ".journal"
+
+    def journalCalibration(self, changes):
+        """
+            Appends changed calibration entries to the calibration journal instead of
+            rewriting the whole configuration. changes is a dictionary keyed by the tuple
+            (address,port) like calibrationMap.
+        """
+        if len(changes) == 0:
+            return
+        lines = [json.dumps([address, port, list(cal)]) for ((address, port), cal) in changes.items()]
+        with open(self.journalFileName(), 'a') as journal:
+            journal.write("\n".join(lines) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def loadJournal(self):
+        """
+            Applies the entries in the calibration journal, if there is one, on top of
+            calibrationMap.
+
+            Returns:
+                The number of entries applied
+        """
+        journalFile = self.journalFileName()
+        if os.path.isfile(journalFile) is False:
+            return 0
+        applied = 0
+        with open(journalFile) as journal:
+            entries = journal.read()
+        for line in entries.splitlines():
+            try:
+                (address, port, cal) = json.loads(line)
+            except ValueError:
+                continue        # A torn write from a crash, the entries before it still count
+            if (address, port) in self.calibrationMap:
+                self.calibrationMap[(address, port)] = cal
+                applied += 1
+        if entries.endswith("\n") is False:
+            with open(journalFile, 'a') as journal:   # Keep the next entry off the torn line
+                journal.write("\n")
+        print("Applied {:d} calibration updates from {:s}".format(applied, journalFile))
+        return applied
+
+    def compactJournal(self, message=None):
+        """
+            Folds the calibration journal into the configuration file and removes it.
+        """
+        self.writeConfig(overwrite=True, message=message)
+        try:
+            os.remove(self.journalFileName())
+        except OSError:
+            pass            # Nothing was journaled
+
     def listFloorFiles (self):
         return list(filter(lambda ls: ls.endswith(".floor"), os.listdir(self.floorDir)))
 
@@ -28,7 +28,7 @@ class LSDisplay():
 
     """
 
-    def __init__(self, rows=None, cols=None, conf=None, eventCallback=None, initScreen=True):
+    def __init__(self, rows=None, cols=None, conf=None, eventCallback=None, initScreen=True, emulator=None, threaded=True):
         if conf is None:
             if rows is None or cols is None:
                 conf = LSFloorConfig()
@@ -37,12 +37,15 @@ class LSDisplay():
                 conf = LSFloorConfig(rows=rows, cols=cols)
                 conf.makeVirtual()
 
-        self.floor = LSFloor(conf, eventCallback = eventCallback)
+        self.floor = LSFloor(conf, eventCallback = eventCallback, threaded = threaded)
 
-        try:
-            self.floor.register(LSPygameFloor)      # For now it's the only emulator we have
-        except BadEmulator:
-            self.floor.register(LSASCIIFloor)
+        if emulator is not None:
+            self.floor.register(emulator)           # e.g. LSNullFloor for running without a display
+        else:
+            try:
+                self.floor.register(LSPygameFloor)
+            except BadEmulator:
+                self.floor.register(LSASCIIFloor)
 
         self.rows = conf.rows
         self.cols = conf.cols
@@ -0,0 +1,391 @@
+""" Procedural effects that fill the whole floor, a frame at a time
+
+Each effect works out a phase from 0 to 255 for every tile on every tick and
+looks it up in a palette, a list of (red, green, blue) masks spread evenly over
+the 256 phases. The phases are kept as bytes so that most of the work is done
+by bytes.translate() with tables built once up front (sine waves, rotations,
+distances from each tile), rather than by Python code run for every tile.
+Where phases have to be combined tile by tile they are packed into one big
+integer, a byte or two per tile, and added or subtracted all at once.
+
+Effects make list-type frames like the ones in lsanimate. frame() returns the
+next one and nextFrame() yields them, so an effect can be drawn with
+floor.renderFrame(), started on a game's LSAnimator or saved with lsanimfile.
+Effects that react to players have stepOn() and stepOff() methods for the game
+to pass its steps on to.
+
+Example:
+
+    class Pond(LSGame):
+        def init(self):
+            self.ripples = lseffects.Ripples(self.rows, self.cols)
+            self.animations.start(self.ripples)
+
+        def stepOn(self, row, col):
+            self.ripples.stepOn(row, col)
+"""
+
+import math
+import random
+import threading
+
+from lightsweeper import Colors
+from lightsweeper import Shapes
+
+# Shapes that fill a tile from the bottom up, from unlit to fully lit
+LEVELS = [Shapes.OFF,
+          Shapes.SEG_D,
+          Shapes.SEG_C + Shapes.SEG_D + Shapes.SEG_E,
+          Shapes.SEG_C + Shapes.SEG_D + Shapes.SEG_E + Shapes.SEG_G,
+          Shapes.SEG_B + Shapes.SEG_C + Shapes.SEG_D + Shapes.SEG_E + Shapes.SEG_F + Shapes.SEG_G,
+          Shapes.EIGHT]
+
+# A palette entry that leaves the tile as it is
+NO_UPDATE = (128, 128, 128)
+
+def masks(shape, color):
+    """
+        Returns the (red, green, blue) masks that show shape in color
+    """
+    return (shape if color & Colors.RED else 0,
+            shape if color & Colors.GREEN else 0,
+            shape if color & Colors.BLUE else 0)
+
+def ramp(color, levels=LEVELS):
+    """
+        Returns a palette that goes from unlit to fully lit in color
+    """
+    return [masks(shape, color) for shape in levels]
+
+def cycle(colors, shape=Shapes.EIGHT):
+    """
+        Returns a palette of shape in each of colors in turn
+    """
+    return [masks(shape, color) for color in colors]
+
+RAINBOW = cycle([Colors.RED, Colors.YELLOW, Colors.GREEN, Colors.CYAN, Colors.BLUE, Colors.MAGENTA])
+FIRE = ramp(Colors.RED, LEVELS[:4]) + ramp(Colors.YELLOW, LEVELS[4:]) + [masks(Shapes.EIGHT, Colors.WHITE)]
+OCEAN = ramp(Colors.BLUE, LEVELS[2:]) + ramp(Colors.CYAN, LEVELS[3:]) + cycle([Colors.WHITE])
+
+# Tables shared by every effect
+SINE = bytes(int(127.5 + 127.49 * math.sin(2 * math.pi * i / 256)) for i in range(256))
+_rotations = [None] * 256
+
+def rotation(n):
+    """
+        Returns the table that adds n to a phase, wrapping around at 256
+    """
+    n = int(n) & 255
+    if _rotations[n] is None:
+        _rotations[n] = bytes((i + n) & 255 for i in range(256))
+    return _rotations[n]
+
+_THIRD = bytes(i // 3 for i in range(256))
+_INVERT = bytes(255 - i for i in range(256))
+_NOT_BORROWED = bytes(255 if i == 1 else 0 for i in range(256))
+_CHOICES = [bytes(255 if i == k else 0 for i in range(256)) for k in range(3)]
+
+def _int(phases):
+    return int.from_bytes(phases, "little")
+
+def _average(*phases):
+    # Returns the tile by tile average of phases, all the same length, to within a phase or two
+    total = sum(_int(p.translate(_THIRD)) for p in phases[:3])     # Thirds never carry into the next tile
+    return total.to_bytes(len(phases[0]), "little")
+
+def _subtract(a, b):
+    # Returns max(a - b, 0) tile by tile. Each tile gets two bytes, the second
+    # holding a 1 to borrow from, so a tile's subtraction never reaches the next.
+    size = len(a)
+    left = bytearray(2 * size)
+    left[0::2] = a
+    left[1::2] = b"\x01" * size
+    right = bytearray(2 * size)
+    right[0::2] = b
+    lanes = (_int(left) - _int(right)).to_bytes(2 * size, "little")
+    return (_int(lanes[0::2]) & _int(lanes[1::2].translate(_NOT_BORROWED))).to_bytes(size, "little")
+
+def _select(choice, options):
+    # Returns options[choice[i]][i] for each tile, choice picks one of up to three options
+    picked = 0
+    for (k, option) in enumerate(options):
+        picked |= _int(option) & _int(choice.translate(_CHOICES[k]))
+    return picked.to_bytes(len(choice), "little")
+
+def _scale(values, top):
+    # Returns values, which run from 0 to top, spread over the phases 0 to 255
+    top = max(top, 1)
+    return bytes(min(255, int(v * 255 / top)) for v in values)
+
+
+class LSEffect():
+    """
+        The base of every effect. Subclasses fill in phases(), which returns a phase
+        for each tile, top left first, or None once the effect has ended.
+
+        Attributes:
+            rows (int):             The number of rows the effect fills
+            cols (int):             The number of columns the effect fills
+            palette (list):         The (red, green, blue) masks the phases are looked up in
+            tick (int):             The number of frames made so far
+    """
+
+    palette = RAINBOW
+
+    def __init__(self, rows, cols, palette=None):
+        self.rows = rows
+        self.cols = cols
+        if palette is not None:
+            self.palette = palette
+        self.tick = 0
+        self.tiles = rows * cols
+        self._rowOf = [i // cols for i in range(self.tiles)]
+        self._colOf = [i % cols for i in range(self.tiles)]
+        self._lookup = None
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "palette":
+            self._lookup = None
+
+    def stepOn(self, row, col):
+        pass
+
+    def stepOff(self, row, col):
+        pass
+
+    def phases(self):
+        raise NotImplementedError("{:s} has no phases() method".format(self.__class__.__name__))
+
+    def _tables(self):
+        # Returns a table per color channel mapping each phase to its palette entry's mask
+        if self._lookup is None:
+            entries = [self.palette[i * len(self.palette) // 256] for i in range(256)]
+            self._lookup = tuple(bytes(entry[k] for entry in entries) for k in range(3))
+        return self._lookup
+
+    def render(self, phases):
+        """
+            Returns the list-type frame that shows phases in the effect's palette
+        """
+        (red, green, blue) = self._tables()
+        phases = bytes(phases)
+        out = bytearray(len(phases) * 3)
+        out[0::3] = phases.translate(red)
+        out[1::3] = phases.translate(green)
+        out[2::3] = phases.translate(blue)
+        frame = [self.cols]
+        frame.extend(out)
+        return frame
+
+    def frame(self):
+        """
+            Returns the effect's next frame, or None once it has ended
+        """
+        phases = self.phases()
+        self.tick += 1
+        if phases is None:
+            return None
+        return self.render(phases)
+
+    def nextFrame(self):
+        while True:
+            frame = self.frame()
+            if frame is None:
+                return
+            yield frame
+
+
+class Gradient(LSEffect):
+    """
+        Bands of the palette that scroll across the floor. direction is one of
+        "horizontal", "vertical", "diagonal" or "radial"; speed is how far the
+        colors move each frame, in phases.
+    """
+
+    def __init__(self, rows, cols, palette=None, direction="horizontal", speed=4):
+        super().__init__(rows, cols, palette)
+        self.speed = speed
+        direction = direction.lower()
+        if direction == "horizontal":
+            base = _scale(self._colOf, cols)
+        elif direction == "vertical":
+            base = _scale(self._rowOf, rows)
+        elif direction == "diagonal":
+            base = _scale([r + c for (r, c) in zip(self._rowOf, self._colOf)], rows + cols)
+        elif direction == "radial":
+            distances = [math.hypot(r - (rows-1)/2, c - (cols-1)/2) for (r, c) in zip(self._rowOf, self._colOf)]
+            base = _scale(distances, max(distances) * 1.25)
+        else:
+            raise ValueError("Unknown gradient direction: {:s}".format(direction))
+        self._base = base
+
+    def phases(self):
+        return self._base.translate(rotation(-self.tick * self.speed))
+
+
+class Plasma(LSEffect):
+    """
+        Overlapping sine waves that drift across the floor and slowly cycle through
+        the palette. scale is how many waves fit across a tile.
+    """
+
+    def __init__(self, rows, cols, palette=None, speed=3, scale=0.15):
+        super().__init__(rows, cols, palette)
+        self.speed = speed
+        (midRow, midCol) = ((rows-1) / 2, (cols-1) / 2)
+        wave = 256 * scale
+        self._x = bytes(int(c * wave) & 255 for c in self._colOf)
+        self._y = bytes(int(r * wave) & 255 for r in self._rowOf)
+        self._d = bytes(int(math.hypot(r - midRow, c - midCol) * wave) & 255 for (r, c) in zip(self._rowOf, self._colOf))
+
+    def phases(self):
+        t = self.tick * self.speed
+        waveX = self._x.translate(rotation(t)).translate(SINE)
+        waveY = self._y.translate(rotation(-t * 2 // 3)).translate(SINE)
+        waveD = self._d.translate(rotation(t // 2)).translate(SINE)
+        return _average(waveX, waveY, waveD).translate(rotation(t // 4))
+
+
+class Wipe(LSEffect):
+    """
+        Paints the floor, speed tiles a frame, from one edge towards direction:
+        "right", "left", "up" or "down". Tiles the wipe hasn't reached yet are left
+        as they are. Ends once the whole floor is covered.
+    """
+
+    def __init__(self, rows, cols, color=Colors.WHITE, shape=Shapes.EIGHT, direction="right", speed=0.5):
+        super().__init__(rows, cols, [NO_UPDATE, masks(shape, color)])
+        self.speed = speed
+        direction = direction.lower()
+        if direction == "right":
+            distance = self._colOf
+        elif direction == "left":
+            distance = [cols - 1 - c for c in self._colOf]
+        elif direction == "down":
+            distance = self._rowOf
+        elif direction == "up":
+            distance = [rows - 1 - r for r in self._rowOf]
+        else:
+            raise ValueError("Unknown wipe direction: {:s}".format(direction))
+        self._distance = bytes(min(d, 255) for d in distance)
+        self._length = max(self._distance) + 1 if self.tiles > 0 else 0
+
+    def phases(self):
+        if int(self.tick * self.speed) >= self._length:     # The last frame covered everything
+            return None
+        reached = int((self.tick + 1) * self.speed)
+        covered = bytes(255 if i < reached else 0 for i in range(256))
+        return self._distance.translate(covered)
+
+
+class Fire(LSEffect):
+    """
+        Flames that rise from the bottom row. Stepping on a tile throws up a spark.
+        cooling is how much the flames fade per row, by default enough for them
+        to reach about two thirds of the way up the floor.
+    """
+
+    palette = FIRE
+    NOISE_SIZE = 4096
+
+    def __init__(self, rows, cols, palette=None, cooling=None):
+        super().__init__(rows, cols, palette)
+        if cooling is None:
+            cooling = max(8, 384 // max(rows, 1))
+        self.cooling = cooling
+        self._heat = bytearray(self.tiles)
+        self._noise = bytes(random.randrange(256) for _ in range(max(self.NOISE_SIZE, 4 * self.tiles)))
+        self._n = 0
+        self._cool = bytes(min(255, i * 2 * cooling // 256) for i in range(256))     # Noise to cooling, averaging cooling
+        self._drift = bytes(i % 3 for i in range(256))                      # Noise to a sideways drift of 0 to 2
+
+    def stepOn(self, row, col):
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self._heat[row*self.cols + col] = 255
+
+    def phases(self):
+        cols = self.cols
+        heat = self._heat
+        noise = self._noise
+        n = self._n
+        if n + 2 * self.tiles > len(noise):
+            n = random.randrange(len(noise) - 2 * self.tiles)
+        cool = noise[n:n + self.tiles].translate(self._cool)
+        drift = noise[n + self.tiles:n + self.tiles + self.tiles].translate(self._drift)
+        self._n = n + 2 * self.tiles
+        # Every tile but the bottom row takes the heat of one of the three tiles
+        # below it, picked by drift, as it was last frame and a little cooler
+        old = bytes(heat)
+        below = old[cols:]
+        size = len(below)
+        left = bytearray(old[cols-1:-1])
+        left[0::cols] = below[0::cols]              # The edges don't wrap around
+        right = bytearray(old[cols+1:] + b"\x00")
+        right[cols-1::cols] = below[cols-1::cols]
+        heat[:size] = _subtract(_select(drift[:size], (left, below, right)), cool[:size])
+        heat[size:] = cool[size:].translate(_INVERT)
+        return heat
+
+
+class Ripples(LSEffect):
+    """
+        Rings that spread out from every tile stepped on and fade as they grow.
+        speed is in tiles a frame and width is the thickness of a ring in tiles.
+        Where rings cross the brightest wins. Tiles with no ring on them show the
+        bottom of the palette, make that NO_UPDATE to lay the ripples over
+        something else.
+    """
+
+    palette = ramp(Colors.CYAN)
+    UNITS = 16      # Distances are kept in sixteenths of a tile
+
+    def __init__(self, rows, cols, palette=None, speed=0.35, width=1.5):
+        super().__init__(rows, cols, palette)
+        self.speed = speed
+        self.width = width
+        self._ripples = list()
+        self._distances = dict()
+        self._rings = dict()
+        self._lock = threading.Lock()
+        self._dark = bytes(self.tiles)
+
+    def stepOn(self, row, col):
+        with self._lock:
+            self._ripples.append((row, col, self.tick))
+
+    def _distanceFrom(self, row, col):
+        # How far each tile is from (row, col), cached per tile
+        if (row, col) not in self._distances:
+            self._distances[(row, col)] = bytes(min(255, int(math.hypot(r - row, c - col) * self.UNITS))
+                                                for (r, c) in zip(self._rowOf, self._colOf))
+        return self._distances[(row, col)]
+
+    def _ring(self, radius, reach):
+        # The table lighting distances near radius, dimmer the closer radius is to reach
+        key = (radius, reach)
+        if key not in self._rings:
+            halfWidth = self.width * self.UNITS / 2
+            peak = 255 * max(0, 1 - radius / reach)
+            self._rings[key] = bytes(int(peak * max(0, 1 - abs(i - radius) / halfWidth)) for i in range(256))
+        return self._rings[key]
+
+    def phases(self):
+        with self._lock:
+            ripples = list(self._ripples)
+        phases = self._dark
+        ended = list()
+        for ripple in ripples:
+            (row, col, start) = ripple
+            distance = self._distanceFrom(row, col)
+            reach = min(255, max(distance) + int(self.width * self.UNITS))
+            radius = int((self.tick - start) * self.speed * self.UNITS)
+            if radius >= reach:
+                ended.append(ripple)
+                continue
+            ring = distance.translate(self._ring(radius, reach))
+            phases = ring if phases is self._dark else bytes(map(max, phases, ring))
+        if ended:
+            with self._lock:
+                self._ripples = [r for r in self._ripples if r not in ended]
+        return phases
@@ -1,12 +1,17 @@
 """ Emulators allow you to interact with running LightSweeper code via various interfaces """
 
 from lightsweeper import lsfloor
+from lightsweeper import lsnetwork
 from lightsweeper import Colors
 
-import os
+from collections import deque
+from queue import Empty
+from queue import Queue
+
 import random
 import string
 import sys
+import threading
 import time
 import types
 
@@ -54,57 +59,426 @@ class LSEmulateFloor(lsfloor.LSFloor):
         """
         yield()
 
-class LSASCIIFloor(LSEmulateFloor):
+class LSNullFloor(LSEmulateFloor):
+    """
+        A floor view that draws nothing. It keeps count of what the game asks of
+        the floor each frame, so the cost of a game can be measured on machines
+        with no display.
+
+        Attributes:
+            frames (int):           The number of heartbeats so far
+            tileUpdates (int):      Tiles written to during the last frame
+            changedTiles (int):     Tiles that look different than they did the frame before
+            interval (float):       Seconds between the last two heartbeats
+            history (deque):        The last historyLength frames, see frameHistory()
+    """
+
+    historyLength = 0       # How many frames to remember, subclasses can turn this on
+    pollBlocks = True
 
     def init(self):
-        pass
+        self.frames = 0
+        self.tileUpdates = 0
+        self.changedTiles = 0
+        self.interval = 0.0
+        self.totalTileUpdates = 0
+        self.totalChangedTiles = 0
+        self.totalInterval = 0.0
+        self.longestInterval = 0.0
+        self.history = deque(maxlen=self.historyLength)
+        self._updates = 0
+        self._lastBeat = None
+        self._frame = bytearray(self.rows * self.cols * 3)
+        self._lastFrame = bytes(self._frame)
+
+    def _count(self, tiles=1):
+        self._updates += tiles
+
+    def set(self, row, col, shape, color):
+        self._count()
+        super().set(row, col, shape, color)
+
+    def setColor(self, row, col, color):
+        self._count()
+        super().setColor(row, col, color)
+
+    def setShape(self, row, col, shape):
+        self._count()
+        super().setShape(row, col, shape)
+
+    def setDigit(self, row, column, digit, color=None):
+        self._count()
+        super().setDigit(row, column, digit, color)
+
+    def setSegments(self, row, col, segments):
+        self._count()
+        super().setSegments(row, col, segments)
+
+    def setRow(self, row, shape, color):
+        self._count(len(self.tiles[row]))
+        super().setRow(row, shape, color)
+
+    def setColumn(self, col, shape, color):
+        self._count(self.rows)
+        super().setColumn(col, shape, color)
+
+    def blank(self, row, col):
+        self._count()
+        super().blank(row, col)
+
+    def clearAll(self):
+        self._count(len(self.tileList))
+        super().clearAll()
+
+    def renderFrame(self, frame, offset=(0,0), clip=None):
+        self._count(sum(1 for i in range(1, len(frame), 3) if frame[i] != 128))
+        super().renderFrame(frame, offset, clip)
 
     def heartbeat(self):
-        self.clearTerm()
-        print("")
-        print("     ", end="")
-        for c in range(self.cols):
-            print("   {:d}    ".format(c+1), end="")
-        print("")
-        print("    +", end="")
+        now = time.perf_counter()
+        if self._lastBeat is not None:
+            self.interval = now - self._lastBeat
+            self.totalInterval += self.interval
+            self.longestInterval = max(self.longestInterval, self.interval)
+        self._lastBeat = now
+
+        frame = self._frame
+        for tile in self.tileList:
+            i = (tile.row*self.cols + tile.col) * 3
+            frame[i:i+3] = bytes(lsnetwork.tileMasks(tile))
+        if frame == self._lastFrame:
+            self.changedTiles = 0
+        else:
+            last = self._lastFrame
+            self.changedTiles = sum(1 for i in range(0, len(frame), 3) if frame[i:i+3] != last[i:i+3])
+            self._lastFrame = bytes(frame)
+        if self.historyLength > 0:
+            self.history.append(self._lastFrame)   # Unchanged frames share one bytes object
+
+        self.frames += 1
+        self.tileUpdates = self._updates
+        self._updates = 0
+        self.totalTileUpdates += self.tileUpdates
+        self.totalChangedTiles += self.changedTiles
+
+    def stats(self):
+        """
+            Returns a dictionary summarizing every frame so far
+        """
+        frames = max(self.frames, 1)
+        return {"frames": self.frames,
+                "tileUpdates": self.totalTileUpdates,
+                "changedTiles": self.totalChangedTiles,
+                "tileUpdatesPerFrame": self.totalTileUpdates / frames,
+                "changedTilesPerFrame": self.totalChangedTiles / frames,
+                "meanInterval": self.totalInterval / max(self.frames-1, 1),
+                "longestInterval": self.longestInterval}
+
+    def frameHistory(self):
+        """
+            Returns the remembered frames, oldest first, in the format used by
+            LSAnimation: [cols, r, g, b, r, g, b, ...]
+        """
+        return [[self.cols] + list(frame) for frame in self.history]
+
+    def pollEvents(self):
+        while True:
+            wait(0.1)
+            yield(())
+
+class LSRecordingFloor(LSNullFloor):
+    """
+        An LSNullFloor that also remembers the last ten minutes or so of frames.
+    """
+
+    historyLength = 18000
+
+# ANSI escape sequences used by LSASCIIFloor. The color codes line up with the
+# constants in Colors: 30 + Colors.RED is red, 30 + Colors.BLUE is blue and so on
+ANSI_CLEAR = "\x1b[2J"
+ANSI_MOVE = "\x1b[{:d};{:d}H"      # row, column, both counted from 1
+ANSI_COLOR = "\x1b[{:d}m"
+ANSI_RESET = "\x1b[0m"
+
+class LSASCIIFloor(LSEmulateFloor):
+    """
+        Draws the floor in a terminal. The board is drawn once, after that only the
+        segments of tiles that changed are rewritten, in color, by moving the cursor
+        to them. Each heartbeat makes a single write to the terminal.
+    """
+
+    def init(self):
+        self._drawn = dict()
+        self._board = None
+
+    def redraw(self):
+        """
+            Draws the whole board again at the next heartbeat
+        """
+        self._drawn = dict()
+        self._board = None
+
+    def _drawBoard(self):
+        # Returns the empty board, with its column numbers and row letters
+        lines = [ANSI_CLEAR + ANSI_MOVE.format(1, 1)]
+        lines.append("")
+        lines.append("     " + "".join("   {:<5d}".format(c+1) for c in range(self.cols)))
+        border = "    +" + "-------+" * self.cols
+        empty = "    |" + "       |" * self.cols
         for r in range(self.rows):
-            for c in range(self.cols):
-                print("-------+", end="")
-            print("")
-            print("    |", end="")
-            for c in range(self.cols):
-                tile = self.tiles[r][c]
-                print("   {:s}   |".format("_" if tile.segments["a"] else " "), end="")
-            print("")
-            print("    |", end="")
-            for c in range(self.cols):
-                tile = self.tiles[r][c]
-                print("  {:s}{:s}{:s}  |".format("|" if tile.segments["f"] else " ",
-                                                 "_" if tile.segments["g"] else " ",
-                                                 "|" if tile.segments["b"] else " "), end="")
-            print("")
-            print(" {:s}. |".format(string.ascii_letters[r]), end="")
-            for c in range(self.cols):
-                tile = self.tiles[r][c]
-                print("  {:s}{:s}{:s}  |".format("|" if tile.segments["e"] else " ",
-                                                 "_" if tile.segments["d"] else " ",
-                                                 "|" if tile.segments["c"] else " "), end="")
-            print("")
-            print("    |", end="")
-            for c in range(self.cols):
-                print("       |", end="")
-            print("")
-            print("    +", end="")
-        for c in range(self.cols):
-            print("-------+", end="")
-        print("")
-
-
-    def clearTerm(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
+            lines.append(border)
+            lines.append(empty)
+            lines.append(empty)
+            lines.append(" {:s}. |".format(string.ascii_letters[r % len(string.ascii_letters)]) + "       |" * self.cols)
+            lines.append(empty)
+        lines.append(border)
+        return "\n".join(lines)
+
+    def _drawTile(self, row, col, segments):
+        # Returns the escape sequences that redraw the segments of one tile
+        (a, b, c, d, e, f, g) = segments
+        top = 5 + row*5                     # The first line of the tile on the screen
+        left = 6 + col*8                    # and its first column
+
+        def seg(char, color):
+            if color:
+                return ANSI_COLOR.format(30 + color) + char
+            return " "
+
+        return "".join([ANSI_MOVE.format(top, left + 3), seg("_", a), ANSI_RESET,
+                        ANSI_MOVE.format(top + 1, left + 2), seg("|", f), seg("_", g), seg("|", b), ANSI_RESET,
+                        ANSI_MOVE.format(top + 2, left + 2), seg("|", e), seg("_", d), seg("|", c), ANSI_RESET])
+
+    def heartbeat(self):
+        out = list()
+        if self._board is None:
+            self._board = self._drawBoard()
+            out.append(self._board)
+        for tile in self.tileList:
+            s = tile.segments
+            segments = (s["a"], s["b"], s["c"], s["d"], s["e"], s["f"], s["g"])
+            if self._drawn.get((tile.row, tile.col)) != segments:
+                self._drawn[(tile.row, tile.col)] = segments
+                out.append(self._drawTile(tile.row, tile.col, segments))
+        if len(out) == 0:
+            return
+        out.append(ANSI_MOVE.format(5 + self.rows*5, 1))     # Park the cursor under the board
+        sys.stdout.write("".join(out))
+        sys.stdout.flush()
+
+# Message types sent by LSMirrorFloor
+MIRROR_KEYFRAME = 1     # rows, cols and every tile on the floor
+MIRROR_DELTA = 2        # the tiles that changed since the last message
+MIRROR_EVENT = 3        # client -> mirror: a sensor reading, as if a tile had produced it
+
+class LSMirrorFloor(LSEmulateFloor):
+    """
+        Serves the floor over TCP so it can be watched from another machine, see
+        LSMirrorClient. A client gets a keyframe of the whole floor when it connects
+        and after that only the tiles that changed. Each client is fed by its own
+        thread, when a client can't keep up the frames it missed are merged into
+        one instead of holding up the game.
+
+        Only this machine can connect unless host is set to another address, for
+        example "0.0.0.0" for every interface; port 0 picks any free port. The
+        address actually used is in self.address. Anyone who can connect may also
+        step on the floor if acceptEvents is set, otherwise the sensor readings
+        clients send are ignored. Set these in a subclass or when registering:
+
+            floor.register(LSMirrorFloor, host="0.0.0.0", acceptEvents=True)
+    """
+
+    host = "127.0.0.1"
+    port = 4118
+    acceptEvents = False    # Pass on the sensor readings clients send
+    pollBlocks = True
+
+    def init(self):
+        self.frameNumber = 0
+        self._shown = dict()
+        self._clients = list()
+        self._lock = threading.Lock()
+        self._events = Queue()
+        self.server = lsnetwork.listen(self.host, self.port)
+        self.address = self.server.getsockname()
+        print("Mirroring the floor on {:s}:{:d}".format(self.address[0], self.address[1]))
+        acceptor = threading.Thread(target=self._accept, name="mirror-accept")
+        acceptor.daemon = True
+        acceptor.start()
+
+    def _accept(self):
+        while True:
+            (sock, peer) = lsnetwork.accept(self.server)
+            with self._lock:
+                events = self._events if self.acceptEvents else None
+                client = self._MirrorConnection(sock, self.rows, self.cols, self.frameNumber, dict(self._shown), events)
+                self._clients.append(client)
+            client.start()
+
+    def heartbeat(self):
+        self.frameNumber += 1
+        changed = dict()
+        for tile in self.tileList:
+            masks = lsnetwork.tileMasks(tile)
+            if self._shown.get((tile.row, tile.col)) != masks:
+                changed[(tile.row, tile.col)] = masks
+        if len(changed) == 0:
+            return
+        with self._lock:
+            self._shown.update(changed)
+            self._clients = [client for client in self._clients if client.alive]
+            for client in self._clients:
+                client.post(self.frameNumber, changed)
+
+    def pollEvents(self):
+        while True:
+            try:
+                yield(self._events.get(timeout=1))
+            except Empty:
+                yield(())
+
+    class _MirrorConnection(threading.Thread):
+        # Runs as a thread for each connected client, sending it whatever has
+        # changed since the last message it managed to receive. Sensor readings
+        # from the client go to events, or nowhere if events is None
+
+        def __init__(self, sock, rows, cols, frameNumber, shown, events):
+            threading.Thread.__init__(self, name="mirror-client")
+            self.daemon = True
+            self.sock = sock
+            self.events = events
+            self.alive = True
+            self.dropped = 0            # Frames that were merged into a later one
+            self._size = lsnetwork.SIZE.pack(rows, cols)
+            self._frameNumber = frameNumber
+            self._pending = shown
+            self._waiting = True
+            self._ready = threading.Condition()
+
+        def post(self, frameNumber, changed):
+            with self._ready:
+                if self._waiting is False:
+                    self.dropped += 1
+                self._pending.update(changed)
+                self._frameNumber = frameNumber
+                self._waiting = False
+                self._ready.notify()
+
+        def _take(self):
+            with self._ready:
+                while self._waiting and self.alive:
+                    self._ready.wait()
+                if not self.alive:
+                    raise lsnetwork.ConnectionClosed("The client went away")
+                tiles = [(row, col, masks) for ((row, col), masks) in self._pending.items()]
+                self._pending = dict()
+                self._waiting = True
+                return (self._frameNumber, tiles)
+
+        def run(self):
+            receiver = threading.Thread(target=self._receive, name="mirror-client-events")
+            receiver.daemon = True
+            receiver.start()
+            try:
+                with self._ready:
+                    tiles = [(row, col, masks) for ((row, col), masks) in self._pending.items()]
+                    self._pending = dict()
+                    frameNumber = self._frameNumber
+                    self._waiting = True
+                lsnetwork.sendMessage(self.sock, MIRROR_KEYFRAME, self._size + lsnetwork.packTiles(frameNumber, tiles))
+                while True:
+                    (frameNumber, tiles) = self._take()
+                    lsnetwork.sendMessage(self.sock, MIRROR_DELTA, lsnetwork.packTiles(frameNumber, tiles))
+            except OSError:
+                pass
+            self.alive = False
+            self.sock.close()
+
+        def _receive(self):
+            # Passes on the sensor readings the client sends until it goes away,
+            # then wakes the sender so it can hang up too
+            try:
+                while True:
+                    (kind, payload) = lsnetwork.recvMessage(self.sock)
+                    if kind == MIRROR_EVENT and self.events is not None:
+                        (timestamp, row, col, sensorPcnt) = lsnetwork.unpackEvent(payload)
+                        self.events.put((row, col, sensorPcnt))
+            except (lsnetwork.ConnectionClosed, OSError):
+                pass
+            with self._ready:
+                self.alive = False
+                self._ready.notify()
+
+class LSMirrorClient():
+    """
+        Connects to an LSMirrorFloor and keeps a copy of the floor it serves.
+
+        Attributes:
+            rows (int):             The number of rows
+            cols (int):             The number of columns
+            frameNumber (int):      The server's frame number as of the last message
+            tiles (dict):           The (red, green, blue) masks of each tile, keyed by (row, col)
+    """
+
+    def __init__(self, address):
+        self.sock = lsnetwork.connect(address)
+        self.rows = self.cols = 0
+        self.frameNumber = 0
+        self.tiles = dict()
+
+    def receive(self):
+        """
+            Waits for the next message from the server and applies it, returns the list of tiles it changed
+        """
+        (kind, payload) = lsnetwork.recvMessage(self.sock)
+        if kind == MIRROR_KEYFRAME:
+            (self.rows, self.cols) = lsnetwork.SIZE.unpack_from(payload)
+            self.tiles = dict()
+            payload = payload[lsnetwork.SIZE.size:]
+        (self.frameNumber, tiles) = lsnetwork.unpackTiles(payload)
+        for (row, col, masks) in tiles:
+            self.tiles[(row, col)] = masks
+        return tiles
+
+    def sendEvent(self, row, col, sensorPcnt):
+        """
+            Sends the mirror a sensor reading for the tile at row, col, it is ignored
+            unless the mirror accepts events
+        """
+        lsnetwork.sendMessage(self.sock, MIRROR_EVENT, lsnetwork.packEvent(time.time(), row, col, sensorPcnt))
+
+    def close(self):
+        self.sock.close()
+
+# The size of a tile in the pygame emulator and where each of its segments is drawn,
+# as (x, y, width, height) in pixels from the tile's top left corner
+TILE_SIZE = 100
+SEGMENTS = "abcdefg"
+SEGMENT_GEOMETRY = {"a": (29, 10, 42, 10),
+                    "b": (71, 17, 10, 30),
+                    "c": (71, 52, 10, 30),
+                    "d": (29, 79, 42, 10),
+                    "e": (19, 52, 10, 30),
+                    "f": (19, 17, 10, 30),
+                    "g": (29, 45, 42, 10)}
+
+# The largest window the pygame emulator will open, bigger floors are seen through
+# a viewport that can be zoomed with +/- and panned with the arrow keys
+MAX_WINDOW = (1200, 800)
+
+# Tiles drawn smaller than this many pixels are drawn as a single block of color
+MIN_DETAILED_TILE = 24
 
 # Tweaks LSFloor to update pygame emulator
 class LSPygameFloor(LSEmulateFloor):
+    """
+        Attributes:
+            tileSize (int):         The size of a tile in pixels at a zoom of 1
+            zoom (float):           The current zoom factor
+            viewport (tuple):       The (x, y) pixel offset of the window into the whole floor
+    """
+
+    tileSize = TILE_SIZE
 
     def init(self):
 
@@ -115,8 +489,8 @@ class LSPygameFloor(LSEmulateFloor):
 
         pygame.init()
 
-        width=self.cols*100
-        height=self.rows*100
+        width = min(self.cols*self.tileSize, MAX_WINDOW[0])
+        height = min(self.rows*self.tileSize, MAX_WINDOW[1])
         print("Making the screen ({:d}x{:d})".format(width,height))
         pygame.display.init()
 
@@ -133,52 +507,128 @@ class LSPygameFloor(LSEmulateFloor):
             useFont = "freemono"
         self.font = pygame.font.SysFont(useFont, 14)
 
+        self._labels = dict()
+        self.zoom = 1.0
+        self.viewport = (0, 0)
+        self._requestedView = None
+        self._setView(1.0, (0, 0))
 
-    def heartbeat(self):
-        #gets the images from the individual tiles, blits them in succession
+    def setView(self, zoom=None, viewport=None):
+        """
+            Zooms and/or pans the window, the change is applied at the next heartbeat.
+            viewport is the (x, y) pixel offset of the window into the whole floor.
+        """
+        self._requestedView = (self.zoom if zoom is None else zoom,
+                               self.viewport if viewport is None else viewport)
+
+    def _setView(self, zoom, viewport):
+        # Sets the zoom and viewport, then redraws the whole window. Every segment
+        # in every color is drawn up front at the new size, after that tiles are
+        # assembled from these sprites and only redrawn when they change
+        self.zoom = max(zoom, 1.0/self.tileSize)
+        self.pixels = max(int(self.tileSize * self.zoom), 1)
+        (width, height) = self.screen.get_size()
+        self.viewport = (min(max(int(viewport[0]), 0), max(self.cols*self.pixels - width, 0)),
+                         min(max(int(viewport[1]), 0), max(self.rows*self.pixels - height, 0)))
+        self._sprites = dict()
+        self._drawn = dict()
+        if self.pixels >= MIN_DETAILED_TILE:
+            for segment in SEGMENTS:
+                for color in [None] + list(range(Colors.BLACK, Colors.WHITE+1)):
+                    self._sprite(segment, color)
         self.screen.blit(self.background, (0,0))
-        for r in range(self.rows):
-            for c in range(self.cols):
-                tile = self.tiles[r][c]
-                image = self._loadImage(tile)
-                self.screen.blit(image, (100 * c, 100 * r))
         pygame.display.update()
 
-    def _addText(self, text, surface, pos):
-        surfaceMeta = surface.get_rect()
-        text = self.font.render(text, 1, Colors.intToRGB(Colors.WHITE))
-        textMeta = text.get_rect()
-        if str(pos[0]) == "center":
-            pos = (surfaceMeta.width/2 - textMeta.width/2, pos[1])
-        if str(pos[1]) == "center":
-            pos = (pos[0], surfaceMeta.height/2 - textMeta.height/2)
-        surface.blit(text, pos)
-        return(surface)
-
-    def _loadImage(self, tile):
+    def _visible(self):
+        # Returns the ranges of rows and columns that can be seen through the viewport
+        (width, height) = self.screen.get_size()
+        (x, y) = self.viewport
+        rows = range(y // self.pixels, min((y + height - 1) // self.pixels + 1, self.rows))
+        cols = range(x // self.pixels, min((x + width - 1) // self.pixels + 1, self.cols))
+        return (rows, cols)
+
+    def heartbeat(self):
+        # Redraws only the visible tiles whose segments or sensor reading changed
+        # since the last heartbeat, then updates just those parts of the window
+        if self._requestedView is not None:
+            (zoom, viewport) = self._requestedView
+            self._requestedView = None
+            self._setView(zoom, viewport)
+        dirty = list()
+        (rows, cols) = self._visible()
+        for row in rows:
+            for col in cols:
+                tile = self.tiles[row][col]
+                try:
+                    state = self._tileState(tile)
+                except AttributeError:
+                    continue                # There is no tile here
+                if self._drawn.get((row, col)) != state:
+                    self._drawn[(row, col)] = state
+                    dirty.append(self._drawTile(row, col, state))
+        if len(dirty) > 0:
+            pygame.display.update(dirty)
+
+    def _tileState(self, tile):
         try:
-            t = self._root.tiles[tile.row][tile.col].sensor
+            t = int(self._root.tiles[tile.row][tile.col].sensor)
         except AttributeError:
             t = 0
-        image = pygame.Surface((100, 100))
-        if t is not 0:
-            image = self._addText("{:d}%".format(int(t)), image, ("center",25))
-        #    image = self._addText("{:d}%".format(int(t)), image, ("center",60))
-        horizontal = (42,10)
-        vertical = (10,30)
-        segMap = [(29,10),(71,17),(71,52),(29,79),(19,52),(19,17),(29,45)]
-        image.fill(Colors.intToRGB(tile.segments["a"]), pygame.Rect(segMap[0],horizontal))
-        image.fill(Colors.intToRGB(tile.segments["b"]), pygame.Rect(segMap[1],vertical))
-        image.fill(Colors.intToRGB(tile.segments["c"]), pygame.Rect(segMap[2],vertical))
-        image.fill(Colors.intToRGB(tile.segments["d"]), pygame.Rect(segMap[3],horizontal))
-        image.fill(Colors.intToRGB(tile.segments["e"]), pygame.Rect(segMap[4],vertical))
-        image.fill(Colors.intToRGB(tile.segments["f"]), pygame.Rect(segMap[5],vertical))
-        image.fill(Colors.intToRGB(tile.segments["g"]), pygame.Rect(segMap[6],horizontal))
-        return image
+        s = tile.segments
+        return (s["a"], s["b"], s["c"], s["d"], s["e"], s["f"], s["g"], t)
+
+    def _drawTile(self, row, col, state):
+        (x, y) = (self.pixels*col - self.viewport[0], self.pixels*row - self.viewport[1])
+        tileRect = pygame.Rect(x, y, self.pixels, self.pixels)
+        if self.pixels < MIN_DETAILED_TILE:
+            self.screen.fill(Colors.intToRGB(self._blockColor(state)), tileRect)
+            return tileRect
+        self.screen.blit(self.background, tileRect, tileRect)
+        scale = self.pixels / TILE_SIZE
+        sensor = state[7]
+        if sensor != 0:
+            label = self._label(sensor)
+            self.screen.blit(label, (x + self.pixels/2 - label.get_width()/2, y + int(25*scale)))
+        for (segment, color) in zip(SEGMENTS, state):
+            (sx, sy, w, h) = SEGMENT_GEOMETRY[segment]
+            self.screen.blit(self._sprite(segment, color), (x + int(sx*scale), y + int(sy*scale)))
+        return tileRect
 
+    def _blockColor(self, state):
+        # The color a tile is drawn in when it's too small to show its segments:
+        # white while it is stepped on, otherwise whichever color most of its segments are lit in
+        if state[7] != 0:
+            return Colors.WHITE
+        lit = [color for color in state[:7] if color]
+        if len(lit) == 0:
+            return Colors.BLACK
+        return max(set(lit), key=lit.count)
+
+    def _sprite(self, segment, color):
+        # Returns a surface of the segment lit in color at the current size, each one
+        # is only ever drawn once per zoom level
+        try:
+            return self._sprites[(segment, color)]
+        except KeyError:
+            (sx, sy, w, h) = SEGMENT_GEOMETRY[segment]
+            scale = self.pixels / TILE_SIZE
+            sprite = pygame.Surface((max(int(w*scale), 1), max(int(h*scale), 1)))
+            sprite.fill(Colors.intToRGB(color))
+            self._sprites[(segment, color)] = sprite
+            return sprite
+
+    def _label(self, sensor):
+        # Returns the rendered sensor percentage, each one is only ever rendered once
+        try:
+            return self._labels[sensor]
+        except KeyError:
+            label = self.font.render("{:d}%".format(sensor), 1, Colors.intToRGB(Colors.WHITE))
+            self._labels[sensor] = label
+            return label
 
     def pollEvents(self):
         level = 50
+        lastClick = None
         while True:
             for event in pygame.event.get():
              #   print(event)                   # Debugging
@@ -187,7 +637,9 @@ class LSPygameFloor(LSEmulateFloor):
                     self.saveAndExit(0)
                 if event.type == KEYDOWN and event.key == K_ESCAPE:
                     self.saveAndExit(0)
-                if event.type == MOUSEBUTTONDOWN:
+                if event.type == KEYDOWN:
+                    self._moveView(event.key)
+                if event.type == MOUSEBUTTONDOWN and rowCol is not None:
                     if event.button is 1: # Left mouse button
                         lastClick = rowCol
                    #     print(level)  # Debugging
@@ -206,11 +658,40 @@ class LSPygameFloor(LSEmulateFloor):
                             yield((rowCol[0], rowCol[1], level))
                 if event.type == MOUSEBUTTONUP:
                  #   print("Clicked off {:d},{:d} ({:d})".format(rowCol[0], rowCol[1],reading)) # Debugging
-                    if event.button is 1:
+                    if event.button is 1 and lastClick is not None:
                         yield((lastClick[0], lastClick[1], 0))
+                        lastClick = None
+            yield(())
+
+    def _moveView(self, key):
+        # Zooms with +/- and pans a tile at a time with the arrow keys
+        (x, y) = self.viewport
+        if key in (K_PLUS, K_EQUALS, K_KP_PLUS):
+            zoom = self.zoom * 1.25
+        elif key in (K_MINUS, K_KP_MINUS):
+            zoom = self.zoom / 1.25
+        else:
+            zoom = self.zoom
+        if key == K_LEFT:
+            x -= self.pixels
+        elif key == K_RIGHT:
+            x += self.pixels
+        elif key == K_UP:
+            y -= self.pixels
+        elif key == K_DOWN:
+            y += self.pixels
+        if zoom != self.zoom:       # Keep the middle of the window where it was
+            (width, height) = self.screen.get_size()
+            ratio = zoom / self.zoom
+            x = (x + width/2) * ratio - width/2
+            y = (y + height/2) * ratio - height/2
+        self.setView(zoom, (x, y))
 
     def _whereDidIPutMyMouse(self, mousePointer):
+        # Returns the (row, col) of the tile under the mouse, or None if it's off the floor
         (x, y) = mousePointer
-        col = int(x/100)
-        row = int(y/100)
-        return (row,col)
+        col = int((x + self.viewport[0]) // self.pixels)
+        row = int((y + self.viewport[1]) // self.pixels)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return (row,col)
+        return None
@@ -0,0 +1,481 @@
+""" Renders LightSweeper animations, screensavers and games to image files
+
+Nothing is drawn on screen and nothing waits on the wall clock. The exporter
+plays everything against a VirtualClock that it hands to the floor and to the
+game's animations, so sleeping only moves the clock forward and a ten minute
+show renders as fast as the game's own code allows. Every frame the floor shows is recorded with the time it was
+shown, then sampled at the output frame rate and written as:
+
+    a PNG sequence          path is a directory, one frame_000000.png per frame
+    an animated GIF         path ends in .gif
+    raw RGB video           path ends in .rgb, or is - for stdout
+
+Raw video can be turned into something else with ffmpeg, for example:
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s 320x240 -r 30 -i show.rgb show.mp4
+
+Example:
+
+    from lightsweeper import lsexport, lsgame
+
+    exporter = lsexport.LSExporter(6, 8)
+    exporter.playGame(lsgame.lsscreensavers.RainbowZipper, seconds=600)
+    exporter.save("zipper.gif")
+
+or from the command line:
+
+    python -m lightsweeper.lsexport RainbowZipper 600 zipper.gif 6 8
+"""
+
+from lightsweeper.lsdisplay import LSDisplay
+from lightsweeper.lsemulate import LSNullFloor
+from lightsweeper.lsemulate import SEGMENTS
+from lightsweeper.lsemulate import SEGMENT_GEOMETRY
+from lightsweeper.lsemulate import TILE_SIZE
+from lightsweeper.lsaudio import LSSilentAudio
+from lightsweeper.lsanimate import LSAnimator
+from lightsweeper.lssensors import LSSensorMatrix
+
+from lightsweeper import Colors
+
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+
+import os
+import struct
+import sys
+import time
+import zlib
+
+# The palette every frame is drawn with, a segment lit in red, green and blue
+# masks r, g and b is drawn in color r + 2g + 4b, which is also its Colors value
+PALETTE = [Colors.intToRGB(color) for color in range(Colors.BLACK, Colors.WHITE+1)]
+
+
+class VirtualClock():
+    """
+        A clock with the same time() and sleep() as the time module. Sleeping
+        moves the clock forward instead of waiting.
+    """
+
+    def __init__(self, start=None):
+        self.now = time.time() if start is None else start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class LSExportFloor(LSNullFloor):
+    """
+        A floor view that remembers every frame it is shown, along with the time it
+        was shown by clock, as a list of (time, masks) tuples.
+    """
+
+    def init(self):
+        super().init()
+        self.clock = time.time
+        self.recording = list()
+
+    def heartbeat(self):
+        super().heartbeat()
+        frame = self._lastFrame
+        if len(self.recording) > 0 and self.recording[-1][1] is frame:
+            return                              # Nothing changed
+        self.recording.append((self.clock(), frame))
+
+
+class LSRasterizer():
+    """
+        Draws frames of tile masks as images, one palette index per pixel. Each
+        tile is drawn at most once per combination of masks.
+    """
+
+    def __init__(self, rows, cols, tileSize=40):
+        self.rows = rows
+        self.cols = cols
+        self.tileSize = tileSize
+        self.width = cols * tileSize
+        self.height = rows * tileSize
+        self._tiles = dict()
+
+    def _tile(self, masks):
+        # Returns the image of one tile as a list of rows of palette indices
+        try:
+            return self._tiles[masks]
+        except KeyError:
+            size = self.tileSize
+            scale = size / TILE_SIZE
+            pixels = [bytearray(size) for _ in range(size)]
+            for (i, segment) in enumerate(SEGMENTS):
+                bit = Colors.SEGMENTMASK[i]
+                color = (1 if masks[0] & bit else 0) + (2 if masks[1] & bit else 0) + (4 if masks[2] & bit else 0)
+                if color == 0:
+                    continue
+                (x, y, w, h) = SEGMENT_GEOMETRY[segment]
+                (x, y) = (int(x*scale), int(y*scale))
+                (w, h) = (max(int(w*scale), 1), max(int(h*scale), 1))
+                for row in pixels[y:y+h]:
+                    row[x:x+w] = bytes([color]) * w
+            image = [bytes(row) for row in pixels]
+            self._tiles[masks] = image
+            return image
+
+    def draw(self, frame, left=0, top=0, right=None, bottom=None):
+        """
+            Returns the pixels of the given range of tiles as one bytes object,
+            frame is rows*cols*3 masks in row-major order.
+        """
+        right = self.cols if right is None else right
+        bottom = self.rows if bottom is None else bottom
+        out = list()
+        for row in range(top, bottom):
+            start = row*self.cols*3
+            images = [self._tile(tuple(frame[start+col*3:start+col*3+3])) for col in range(left, right)]
+            for y in range(self.tileSize):
+                out.append(b"".join(image[y] for image in images))
+        return b"".join(out)
+
+
+class _FrameWriter(ABC):
+    # Takes frames one at a time, each with the number of output frames it lasts for
+
+    def __init__(self, path, rasterizer, frameRate):
+        self.path = path
+        self.rasterizer = rasterizer
+        self.frameRate = frameRate
+        self.frames = 0
+
+    @abstractmethod
+    def write(self, frame, count=1):
+        pass
+
+    def close(self):
+        pass
+
+
+class PNGWriter(_FrameWriter):
+    """
+        Writes each frame as a palette PNG in the directory path
+    """
+
+    def __init__(self, path, rasterizer, frameRate):
+        super().__init__(path, rasterizer, frameRate)
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _chunk(kind, data):
+        return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data) & 0xffffffff)
+
+    def _encode(self, frame):
+        r = self.rasterizer
+        pixels = r.draw(frame)
+        scanlines = b"".join(b"\x00" + pixels[y*r.width:(y+1)*r.width] for y in range(r.height))
+        return b"".join([b"\x89PNG\r\n\x1a\n",
+                         self._chunk(b"IHDR", struct.pack("!IIBBBBB", r.width, r.height, 8, 3, 0, 0, 0)),
+                         self._chunk(b"PLTE", bytes(c for rgb in PALETTE for c in rgb)),
+                         self._chunk(b"IDAT", zlib.compress(scanlines)),
+                         self._chunk(b"IEND", b"")])
+
+    def write(self, frame, count=1):
+        png = self._encode(frame)       # Encoded once, however many times it is repeated
+        for _ in range(count):
+            with open(os.path.join(self.path, "frame_{:06d}.png".format(self.frames)), "wb") as f:
+                f.write(png)
+            self.frames += 1
+
+
+class RawRGBWriter(_FrameWriter):
+    """
+        Writes every frame as width*height*3 bytes of RGB to the file path, or to stdout if path is -
+    """
+
+    _CHANNELS = [bytes(rgb[channel] for rgb in PALETTE) + bytes(256-len(PALETTE)) for channel in range(3)]
+
+    def __init__(self, path, rasterizer, frameRate):
+        super().__init__(path, rasterizer, frameRate)
+        self.out = sys.stdout.buffer if path == "-" else open(path, "wb")
+
+    def write(self, frame, count=1):
+        pixels = self.rasterizer.draw(frame)
+        rgb = bytearray(len(pixels) * 3)
+        for channel in range(3):
+            rgb[channel::3] = pixels.translate(self._CHANNELS[channel])
+        for _ in range(count):
+            self.out.write(rgb)
+        self.frames += count
+
+    def close(self):
+        self.out.flush()
+        if self.out is not sys.stdout.buffer:
+            self.out.close()
+
+
+class GIFWriter(_FrameWriter):
+    """
+        Writes an animated GIF to the file path. A frame that lasts for several
+        output frames is stored once with a longer delay, and only the tiles that
+        changed since the frame before are stored.
+    """
+
+    _MIN_CODE_SIZE = 3      # Enough for the eight colors in PALETTE
+    _CACHE_SIZE = 512       # Encoded images kept for reuse
+
+    def __init__(self, path, rasterizer, frameRate):
+        super().__init__(path, rasterizer, frameRate)
+        self.out = open(path, "wb")
+        self.out.write(b"GIF89a")
+        self.out.write(struct.pack("<HHBBB", rasterizer.width, rasterizer.height, 0xf2, 0, 0))
+        self.out.write(bytes(c for rgb in PALETTE for c in rgb))
+        self.out.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")   # Loop forever
+        self._pending = None
+        self._shown = None
+        self._time = 0.0            # Seconds of animation written so far
+        self._delays = 0            # and the same in hundredths, as GIF stores it
+        self._images = OrderedDict()
+
+    def write(self, frame, count=1):
+        if self._pending is not None and self._pending[0] == frame:
+            self._pending[1] += count
+        else:
+            self._flush()
+            self._pending = [frame, count]
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        (frame, count) = self._pending
+        self._time += count / self.frameRate
+        delay = max(int(round(self._time * 100)) - self._delays, 1)
+        self._delays += delay
+        self.out.write(b"\x21\xf9\x04" + struct.pack("<BHBB", 0x04, min(delay, 0xffff), 0, 0))
+        self.out.write(self._image(self._shown, frame))
+        self._shown = frame
+        self.frames += count
+
+    def _image(self, shown, frame):
+        # Returns the image block that turns shown into frame. Looping shows go
+        # through the same pairs of frames over and over, so blocks are cached
+        key = (shown, frame)
+        try:
+            image = self._images.pop(key)
+        except KeyError:
+            bounds = self._changed(frame)
+            if bounds is None:              # Nothing changed, store a single pixel
+                bounds = (0, 0, 1, 1)
+            (left, top, right, bottom) = bounds
+            size = self.rasterizer.tileSize
+            data = _lzwEncode(self.rasterizer.draw(frame, left, top, right, bottom), self._MIN_CODE_SIZE)
+            out = [b"\x2c" + struct.pack("<HHHHB", left*size, top*size, (right-left)*size, (bottom-top)*size, 0)]
+            out.append(bytes([self._MIN_CODE_SIZE]))
+            for i in range(0, len(data), 255):
+                block = data[i:i+255]
+                out.append(bytes([len(block)]) + block)
+            out.append(b"\x00")
+            image = b"".join(out)
+            if len(self._images) >= self._CACHE_SIZE:
+                self._images.popitem(last=False)
+        self._images[key] = image
+        return image
+
+    def _changed(self, frame):
+        # Returns the (left, top, right, bottom) range of tiles that changed since the last frame
+        if self._shown is None:
+            return (0, 0, self.rasterizer.cols, self.rasterizer.rows)
+        cols = self.rasterizer.cols
+        changed = [i//3 for i in range(0, len(frame), 3) if frame[i:i+3] != self._shown[i:i+3]]
+        if len(changed) == 0:
+            return None
+        rows = [i // cols for i in changed]
+        columns = [i % cols for i in changed]
+        return (min(columns), min(rows), max(columns)+1, max(rows)+1)
+
+    def close(self):
+        self._flush()
+        self.out.write(b"\x3b")
+        self.out.close()
+
+
+def _lzwEncode(pixels, minCodeSize):
+    # Compresses pixels with the variable length LZW used by GIF
+    clear = 1 << minCodeSize
+    end = clear + 1
+    out = bytearray()
+    bits = 0
+    bitCount = 0
+
+    codeSize = minCodeSize + 1
+    table = dict()
+    nextCode = end + 1
+    prefix = None
+    codes = [clear]
+    for pixel in pixels:
+        if prefix is None:
+            prefix = pixel
+            continue
+        key = (prefix << 8) | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        codes.append(prefix)
+        if nextCode < 4096:
+            table[key] = nextCode
+            nextCode += 1
+        else:
+            codes.append(clear)     # The table is full, start over
+            table = dict()
+            nextCode = end + 1
+        prefix = pixel
+    if prefix is not None:
+        codes.append(prefix)
+    codes.append(end)
+
+    # The width of each code depends on how many entries the decoder's table holds by then
+    nextCode = end + 1
+    first = True
+    for code in codes:
+        bits |= code << bitCount
+        bitCount += codeSize
+        while bitCount >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            bitCount -= 8
+        if code == clear:
+            codeSize = minCodeSize + 1
+            nextCode = end + 1
+            first = True
+        elif first:
+            first = False           # The decoder adds nothing after the first code
+        else:
+            nextCode += 1
+            if nextCode == (1 << codeSize) and codeSize < 12:
+                codeSize += 1
+    if bitCount > 0:
+        out.append(bits & 0xff)
+    return bytes(out)
+
+
+WRITERS = {"png": PNGWriter, "gif": GIFWriter, "rgb": RawRGBWriter}
+
+
+class LSExporter():
+    """
+        Plays animations, screensavers and games on a virtual floor against a
+        virtual clock and saves what the floor showed.
+
+        Attributes:
+            rows (int):             The number of rows
+            cols (int):             The number of columns
+            frameRate (int):        Frames per second written by save()
+            tileSize (int):         The size of a tile in the output, in pixels
+            clock (VirtualClock):   The clock everything is played against
+            display (LSDisplay):    The display animations and games are played on
+    """
+
+    def __init__(self, rows, cols, frameRate=30, tileSize=40):
+        self.rows = rows
+        self.cols = cols
+        self.frameRate = frameRate
+        self.tileSize = tileSize
+        self.clock = VirtualClock()
+        self.display = LSDisplay(rows, cols, initScreen=False, emulator=LSExportFloor)
+        self.view = self.display.floor.views[0]
+        self.view.clock = self.clock.time
+        self.start = self.clock.time()
+        self.display.heartbeat()                # The blank floor everything starts from
+
+    def playAnimation(self, animation, frameRate=30):
+        """
+            Plays an LSAnimation once
+        """
+        animations = LSAnimator(self.display, clock=self.clock.time)
+        playback = animations.start(animation)  # A frame a step, the steps keep the rate
+        while True:
+            animations.step()
+            if not playback.playing:
+                break
+            self.display.heartbeat()
+            self.clock.sleep(1.0/frameRate)
+
+    def playGame(self, Game, seconds):
+        """
+            Plays a game or screensaver class for the given number of seconds, or until the game ends
+        """
+        game = Game(self.display, LSSilentAudio(), self.rows, self.cols, False)
+        game.sensors = LSSensorMatrix(self.rows, self.cols)
+        game.animations = LSAnimator(self.display, clock=self.clock.time)
+        try:
+            game.init()
+        except AttributeError:
+            pass            # Game has no init() method
+        stop = self.clock.time() + seconds
+        while self.clock.time() < stop and not game.ended:
+            game.sensors.nextFrame()
+            game.heartbeat(game.sensors.pressed())
+            game.animations.step()
+            self.display.heartbeat()
+            frameRate = game.frameRate if game.frameRate > 0 else self.frameRate
+            self.clock.sleep(1.0/frameRate)
+
+    def frames(self):
+        """
+            Yields the tuple (frame, count) for each run of identical output frames
+        """
+        recording = self.view.recording
+        total = int((self.clock.time() - self.start) * self.frameRate)
+        i = 0
+        run = None
+        for n in range(total):
+            t = self.start + n/self.frameRate
+            while i+1 < len(recording) and recording[i+1][0] <= t:
+                i += 1
+            frame = recording[i][1]
+            if run is not None and run[0] is frame:
+                run[1] += 1
+                continue
+            if run is not None:
+                yield tuple(run)
+            run = [frame, 1]
+        if run is not None:
+            yield tuple(run)
+
+    def save(self, path, format=None):
+        """
+            Writes everything played so far to path, returns the number of frames written.
+            format is one of "png", "gif" or "rgb" and is worked out from path if not given.
+        """
+        if format is None:
+            extension = os.path.splitext(path)[1].lstrip(".").lower()
+            format = extension if extension in WRITERS else ("rgb" if path == "-" else "png")
+        writer = WRITERS[format](path, LSRasterizer(self.rows, self.cols, self.tileSize), self.frameRate)
+        for (frame, count) in self.frames():
+            writer.write(frame, count)
+        writer.close()
+        return writer.frames
+
+
+def main():
+    from lightsweeper.lsgame import SAVERS
+
+    if len(sys.argv) < 4:
+        print("Usage: python -m lightsweeper.lsexport SCREENSAVER SECONDS PATH [ROWS COLS]")
+        print("Screensavers: " + ", ".join(s.__name__ for s in SAVERS))
+        sys.exit(1)
+    Game = dict((s.__name__, s) for s in SAVERS)[sys.argv[1]]
+    seconds = float(sys.argv[2])
+    (rows, cols) = (int(sys.argv[4]), int(sys.argv[5])) if len(sys.argv) > 5 else (6, 8)
+
+    exporter = LSExporter(rows, cols)
+    started = time.time()
+    exporter.playGame(Game, seconds)
+    frames = exporter.save(sys.argv[3])
+    print("Wrote {:d} frames in {:.1f} seconds".format(frames, time.time() - started), file=sys.stderr)
+    sys.stderr.flush()
+    os._exit(0)         # The floor's threads never finish on their own
+
+if __name__ == '__main__':
+    main()
@@ -12,7 +12,6 @@ from lightsweeper import Shapes
 
 from collections import defaultdict
 from queue import Queue
-import itertools
 
 import atexit
 import copy
@@ -25,6 +24,9 @@ import time
 
 wait=time.sleep
 
+# Calibration changes are written to the journal at most this often (in seconds)
+CALIBRATION_JOURNAL_INTERVAL = 5
+
 class LSFloor():
     
     """
@@ -38,8 +40,15 @@ class LSFloor():
             tileList (list):        A single array of LSTile objects
             tiles (list):           A double array of LSTile objects, e.g.: tiles[row][column]
             views (list):           A list of emulators and displays bound to this floor
+            pollInterval (float):   Seconds to rest between sensor sweeps, raised while the floor is idle
+            threaded (bool):        Whether the floor runs its own I/O threads. Without them the
+                                    poll() and handle() methods of each view's io and of the
+                                    eventHandler have to be called by someone else, see lsasync
     """
-    def __init__(self, conf, eventCallback=None):
+
+    pollBlocks = False      # Whether pollEvents() sleeps or blocks while waiting for events
+
+    def __init__(self, conf, eventCallback=None, threaded=True):
         
         # Establish a lock so polling threads don't start running until everything is initialized.
         # This lock is set in lsgame.LSGameEngine
@@ -55,6 +64,8 @@ class LSFloor():
         self.tileList = []
         self.views = []
         self._virtualTileList = []
+        self.pollInterval = 0
+        self.threaded = threaded
 
         # Initialize calibration map
         self.calibrationMap = conf.calibrationMap
@@ -74,16 +85,25 @@ class LSFloor():
         # self._events is a thread-safe queue of events that look like (row, col, touch-sensor-percent)
         # LSFloor instances put event tuples into the queue
         self._events = Queue()
-        eventHandler = self._handleEvents(0,
-                                          "{:s}-io-root".format(self.__class__.__name__),
-                                          self._events,
-                                          self.tiles,
-                                          eventCallback)
-        eventHandler.start()
-
-        # Register an LSRealFloor instance if there are real tiles in the configuration
+        self.eventHandler = self._handleEvents(0,
+                                               "{:s}-io-root".format(self.__class__.__name__),
+                                               self._events,
+                                               self.tiles,
+                                               eventCallback)
+        if self.threaded:
+            self.eventHandler.start()
+
+        # Register an LSRealFloor instance if there are real tiles in the configuration,
+        # or a view that hands them to other processes if the configuration asks for it
         if self.conf.containsReal() is True:
-            self.register(LSRealFloor)
+            if self.conf.shards is not None:
+                from lightsweeper.lsshard import LSShardedFloor     # lsshard builds on this module
+                self.register(LSShardedFloor)
+            elif self.conf.ioProcess is True:
+                from lightsweeper.lsprocess import LSIOProcessFloor # and so does lsprocess
+                self.register(LSIOProcessFloor)
+            else:
+                self.register(LSRealFloor)
 
     def _addTilesFromConf(self):
         
@@ -95,7 +115,8 @@ class LSFloor():
             self._addressToRowColumn[(address,port)] = (row, col)
             tile.assignAddress(address)
             tile.port = port
-            wait(.05)
+            if port != "virtual":
+                wait(.05)               # Give real tiles time to answer
             self.tileList.append(tile)
             if port == "virtual":
                 self._virtualTileList.append(tile)
@@ -135,34 +156,42 @@ class LSFloor():
         # which continously calls the instance's pollEvents() generator and adds
         # corresponding events to the root LSFloor instance's _event Queue.
         # An event is a tuple of the form (row, col, tile-sensor-percent)
+        # Between events it rests for the root floor's pollInterval.
 
         def __init__(self, ID, name, view):
             threading.Thread.__init__(self)
             self.ID = ID
             self.name = name
             self.view = view
+            self._pollingLoop = None
 
         def run(self):
             print("Starting " + self.name)
-            pollEvents = getattr(self.view, "pollEvents")
-            pollingLoop = pollEvents()
-            staleSensor = 0
             while True:
+                if len(self.poll()) == 0 and self.view._root.pollInterval > 0:
+                    wait(self.view._root.pollInterval)
+
+        def poll(self):
+            # Takes one event from the view, passes it on to the root floor if the
+            # tile's sensor changed and returns it, or returns () if there was none
+            if self._pollingLoop is None:
+                self._pollingLoop = self.view.pollEvents()
+            try:
+                event = next(self._pollingLoop)
+            except StopIteration:
+                event = ()              # No events in queue
+            if len(event) > 0:
+                r,c = event[0], event[1]
+                sensorPcnt = event[2]
                 try:
-                    event = next(pollingLoop)
-                except StopIteration:
-                    pass                    # No events in queue
-                if len(event) > 0:
-                    r,c = event[0], event[1]
-                    sensorPcnt = event[2]
-                    try:
-                        staleSensor = self.view.tiles[r][c].sensor
-                    except AttributeError:
-                        staleSensor = 0
-                    if staleSensor != sensorPcnt:
-                        tile = self.view.tiles[r][c]
-                        tile.sensor = sensorPcnt
-                        self.view._root._events.put(event)
+                    staleSensor = self.view.tiles[r][c].sensor
+                except AttributeError:
+                    staleSensor = 0
+                if staleSensor != sensorPcnt:
+                    tile = self.view.tiles[r][c]
+                    tile.sensor = sensorPcnt
+                    self.view._root._events.put(event)
+            return event
 
     class _handleEvents(threading.Thread):
             # The _handleEvents class runs as a single thread from the root LSFloor
@@ -184,26 +213,30 @@ class LSFloor():
                 self.pushEvent = lambda e: eventCallback(e[0],e[1],e[2])
 
         def run(self):
-            stale = 0
             while(True):
-                event = self.queue.get()
-                row,col,sensorPcnt = event
-                tile = self.tiles[row][col]
-                try:
-                    stale = tile.sensor
-                except AttributeError:
-                  #  print("INFO: The tile at ({:d},{:d}) has been touched for the very first time.".format(row,col)) # Debugging
-                    stale = 0
-                if stale is 0:
-                    print("Stepped on ({:d},{:d})".format(row,col)) # Debugging
-                if sensorPcnt is 0:
-                    print("Stepped off ({:d},{:d})".format(row,col)) # Debugging
-                tile.sensor = sensorPcnt
-                self.pushEvent(event)
-
-    def register(self, Emulator):
+                self.handle(self.queue.get())
+
+        def handle(self, event):
+            row,col,sensorPcnt = event
+            tile = self.tiles[row][col]
+            try:
+                stale = tile.sensor
+            except AttributeError:
+              #  print("INFO: The tile at ({:d},{:d}) has been touched for the very first time.".format(row,col)) # Debugging
+                stale = 0
+            if stale is 0:
+                print("Stepped on ({:d},{:d})".format(row,col)) # Debugging
+            if sensorPcnt is 0:
+                print("Stepped off ({:d},{:d})".format(row,col)) # Debugging
+            tile.sensor = sensorPcnt
+            self.pushEvent(event)
+
+    def register(self, Emulator, **settings):
         """
-            Allows you to register additional emulators to this floor.
+            Allows you to register additional emulators to this floor. Any settings
+            are set as attributes of the new view before its init() runs, overriding
+            the ones the emulator's class gives, for example
+            floor.register(lsemulate.LSMirrorFloor, acceptEvents=True).
 
             Example:
                 >>> import lsfloor, lsconfig, lsemulate
@@ -225,13 +258,16 @@ class LSFloor():
         newFloor = object.__new__(Emulator)  # An instantiation of Emulator without calling __init__
         baseFloor.__class__ = newFloor.__class__ # Take the class from Emulator's floor
         baseFloor._root = self
+        for (name, value) in settings.items():
+            setattr(baseFloor, name, value)
         baseFloor.init()
         self.views.append(baseFloor)
         viewIndex = len(self.views)
 
         # Start a polling loop for this floor in a new thread
         baseFloor.io = self._IOLoop(viewIndex, "{:s}-io".format(Emulator.__name__), self.views[viewIndex-1])
-        baseFloor.io.start()
+        if self.threaded:
+            baseFloor.io.start()
                 
     def saveAndExit(self, exitCode):
         """
@@ -344,26 +380,35 @@ class LSFloor():
         for tile in self.tileList:
             tile.blank()
 
-    def renderFrame(self, frame):
-    # TODO: LSRealTile, should optimize tile calls
-    
-        frame = frame[:]
-
-        cols = frame.pop(0)
-        row = 0
-        col = 0
-        for _ in itertools.repeat(None, int(len(frame)/3)):
-            if col is cols:
-                row += 1
-                col = 0
-            rMask = frame.pop(0)
-            gMask = frame.pop(0)
-            bMask = frame.pop(0)
-            if rMask is not 128:
-                self.tiles[row][col].setSegments((rMask,gMask,bMask))
-           #     print("{:d},{:d} -> ({:d},{:d},{:d})".format(row,col,rMask,gMask,bMask)) # Debugging
-            col += 1
-
+    def renderFrame(self, frame, offset=(0,0), clip=None):
+        """
+            Draws a frame on the floor with its top left tile at offset (row, col). Only
+            the part of the frame inside clip, a (row, col, rows, cols) rectangle of the
+            floor, is drawn; by default that is the whole floor. Tiles with a red mask of
+            128 and tiles that already show the frame's masks are left alone.
+        """
+        cols = frame[0]
+        rows = (len(frame) - 1) // 3 // cols
+        (rowOffset, colOffset) = offset
+        if clip is None:
+            clip = (0, 0, self.rows, self.cols)
+        (clipRow, clipCol, clipRows, clipCols) = clip
+        top = max(clipRow, rowOffset, 0)
+        bottom = min(clipRow + clipRows, rowOffset + rows, self.rows)
+        left = max(clipCol, colOffset, 0)
+        right = min(clipCol + clipCols, colOffset + cols, self.cols)
+
+        for row in range(top, bottom):
+            tiles = self.tiles[row]
+            i = 1 + ((row - rowOffset)*cols + left - colOffset) * 3
+            for col in range(left, right):
+                rMask = frame[i]
+                if rMask != 128:
+                    masks = (rMask, frame[i+1], frame[i+2])
+                    tile = tiles[col]
+                    if tile != 0 and tile.masks != masks:   # 0 if there is no tile here
+                        tile.setSegments(masks)
+                i += 3
 
     def heartbeat(self):
         pass
@@ -415,23 +460,51 @@ class LSRealFloor(LSFloor):
         self._addTilesFromConf()
         self._eventQueue = Queue()
 
+        self._pendingCalibration = dict()
+        self._lastJournalWrite = time.time()
+        self._journalLock = threading.Lock()
+
         portSieve = defaultdict(list)
 
-        for row in range(self.rows):
-            for col in range(self.cols):
-                tile = self.tiles[row][col]
+        for tile in self.tileList:
+            if tile.port != "virtual":          # A shard's configuration may not cover the whole floor
                 portSieve[tile.serial.port].append(tile)
 
+        self.monitors = list()
         for port, tiles in portSieve.items():
             portEvents = self._threadedEventPoll(port, tiles, self)
-            portEvents.start()
+            self.monitors.append(portEvents)
+            if self.threaded:
+                portEvents.start()
 
-        # Save changes to self.config (namely the most recent calibrationMap)
+        # Fold the calibration journal back into self.config on a clean exit
         atexit.register(self._saveState)
 
     def _saveState(self):
-        self.conf.calibrationMap = self.calibrationMap
-        self.conf.writeConfig(overwrite=True, message="Saving calibration map...")
+        with self._journalLock:
+            self._pendingCalibration = dict()
+            self.conf.calibrationMap = self.calibrationMap
+            self.conf.compactJournal(message="Saving calibration map...")
+
+    def _calibrationChanged(self, key):
+        # Queues the calibration entry at key to be written to the journal
+        with self._journalLock:
+            self._pendingCalibration[key] = tuple(self.calibrationMap[key])
+
+    def _flushCalibration(self):
+        # Writes queued calibration entries to the journal, at most once every CALIBRATION_JOURNAL_INTERVAL seconds
+        with self._journalLock:
+            if len(self._pendingCalibration) == 0:
+                return
+            now = time.time()
+            if now - self._lastJournalWrite < CALIBRATION_JOURNAL_INTERVAL:
+                return
+            try:
+                self.conf.journalCalibration(self._pendingCalibration)
+            except IOError as e:
+                print("Could not write calibration journal: {:s}".format(str(e)))
+            self._pendingCalibration = dict()
+            self._lastJournalWrite = now
 
     def _returnTile(self, row, col, port):
         # Returns an abstract tile object if the configuration calls for a virtual tile
@@ -448,6 +521,7 @@ class LSRealFloor(LSFloor):
             zeroTile.setColor(color)
         for tile in self.tileList:
             tile.color = color
+            tile.masks = None
 
     def setAllShape(self, shape):
         for port in self.realTiles.sharedSerials.keys():
@@ -456,6 +530,7 @@ class LSRealFloor(LSFloor):
             zeroTile.setShape(shape)
         for tile in self.tileList:
             tile.shape = shape
+            tile.masks = None
 
     def setAllSegments(self, segments):
         for port in self.realTiles.sharedSerials.keys():
@@ -464,6 +539,7 @@ class LSRealFloor(LSFloor):
             zeroTile.setSegments(segments)
         for tile in self.tileList:
             tile.shape = segments[0]|segments[1]|segments[2]
+            tile.masks = None
 
     def clearAll(self):
         for port in self.realTiles.sharedSerials.keys():
@@ -473,6 +549,7 @@ class LSRealFloor(LSFloor):
         for tile in self.tileList:
             tile.shape = 0
             tile.color = 0
+            tile.masks = None
 
     def latch(self, row, col):
         tile = self.tiles[row][col]         # TODO: Check if tile is virtual
@@ -490,6 +567,7 @@ class LSRealFloor(LSFloor):
             while not self._eventQueue.empty():
                 event = self._eventQueue.get()
                 yield(event)
+            yield(())
 
     class _threadedEventPoll(threading.Thread):
 
@@ -502,27 +580,37 @@ class LSRealFloor(LSFloor):
         def run(self):
             while True:
                 for tile in self.tiles:
-                    reading = tile.sensorStatus()
-
-                    cMap = self.floor.calibrationMap[(tile.address,tile.port)]
-                    # A higher reading is less weight on the pressure sensor
-                    lowest = cMap[0]
-                    highest = cMap[1]
-                    if reading < lowest:
-                        lowest = reading
-                        cMap[0] = lowest
-                    elif reading > highest:
-                        highest = reading
-                        cMap[1] = highest
-                    self.floor.calibrationMap[(tile.address,tile.port)] = cMap
-
-                    if reading is highest:
-                        self.floor._eventQueue.put((tile.row, tile.col, 0))
-                    elif reading is lowest and lowest < 127:
-                        self.floor._eventQueue.put((tile.row, tile.col, lowest))
-                    else:
-                        pcntOut = (((reading-highest)*100)/(lowest-highest))
-                        self.floor._eventQueue.put((tile.row, tile.col, pcntOut))
+                    self.read(tile)
+                self.floor._flushCalibration()
+                if self.floor._root.pollInterval > 0:
+                    wait(self.floor._root.pollInterval)     # The floor is idle, sweep less often
+
+        def read(self, tile):
+            # Reads tile's sensor and queues the reading as an event
+            reading = tile.sensorStatus()
+
+            cMap = self.floor.calibrationMap[(tile.address,tile.port)]
+            # A higher reading is less weight on the pressure sensor
+            lowest = cMap[0]
+            highest = cMap[1]
+            if reading < lowest:
+                lowest = reading
+                cMap[0] = lowest
+                self.floor.calibrationMap[(tile.address,tile.port)] = cMap
+                self.floor._calibrationChanged((tile.address,tile.port))
+            elif reading > highest:
+                highest = reading
+                cMap[1] = highest
+                self.floor.calibrationMap[(tile.address,tile.port)] = cMap
+                self.floor._calibrationChanged((tile.address,tile.port))
+
+            if reading is highest:
+                self.floor._eventQueue.put((tile.row, tile.col, 0))
+            elif reading is lowest and lowest < 127:
+                self.floor._eventQueue.put((tile.row, tile.col, lowest))
+            else:
+                pcntOut = (((reading-highest)*100)/(lowest-highest))
+                self.floor._eventQueue.put((tile.row, tile.col, pcntOut))
 
 
 class MetaFloor(LSFloor):
@@ -9,13 +9,18 @@ import threading
 import time
 
 from collections import defaultdict
+from collections import deque
 from collections import OrderedDict
 from datetime import timedelta
 
 from lightsweeper.lsdisplay import LSDisplay
 from lightsweeper.lsaudio import LSAudio
+from lightsweeper.lsanimate import LSAnimator
 from lightsweeper.lsconfig import LSFloorConfig
 from lightsweeper.lsconfig import userSelect
+from lightsweeper.lsprofile import LSProfiler
+from lightsweeper.lssensors import LSSensorMatrix
+from lightsweeper.lsstats import LSFrameStats
 import lightsweeper.lsconfig as lsconfig
 
 from lightsweeper import Colors
@@ -24,6 +29,17 @@ from lightsweeper import Shapes
 FPS = 30
 _SENSOR_THRESHOLD = 0
 
+# What LSGameEngine does when a tick runs late
+CATCH_UP = "catchup"    # Run the missed ticks back to back, without output, until back on time
+DROP = "drop"           # Skip the missed ticks and carry on from the next one due
+
+STATUS_INTERVAL = 1     # Seconds between updates of the FPS line on the console
+STATS_HISTORY = 20      # How many finished games' frame statistics LSGameEngine keeps
+
+# Besides the game thread, the profiler samples threads with these in their names:
+# the floor's event handler and view loops, and the serial event monitors
+PROFILED_THREADS = ["-io", "-event-monitor"]
+
 class LSGame():
     def __init__(game, display, audio, rows, cols, reader):
 
@@ -35,12 +51,18 @@ class LSGame():
         game.ended = False
         game.duration = 0
         game.frameRate = FPS
+        game.outputRate = None      # Frames a second sent to the floor, None for every tick
         game.display.clearAll()
         game._reader = reader
 
     def heartbeat (*args, **kwargs):
         pass
 
+    def pumpEvents(game):
+        # Steps arrive on the floor's own threads. An engine without them, such as
+        # LSAsyncGameEngine, replaces this so a game waiting for steps still gets them
+        pass
+
     def over (game, score=None):
         print("[Game Over]")
         game._keepScore(score)
@@ -61,6 +83,7 @@ class LSGame():
                 while not game.keyBuffer:
                     game.heartbeat([])
                     game.display.heartbeat()
+                    game.pumpEvents()
                 name = game.keyBuffer
             game.__addScore__(score, name)
             game.scoreKeeper.showScores()
@@ -97,11 +120,96 @@ class getInput(threading.Thread):
             pass
         self.game.keyBuffer = self.kb.output
 
+class _FrameBank():
+    # A screensaver's frames for one floor size, built once by whichever thread gets to it first
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.contents = None
+
 class LSScreenSaver(LSGame):
+    _banks = dict()
+    _banksLock = threading.Lock()
+
     def __init__(game, *args, **kwargs):
         super().__init__(*args, **kwargs)
         game.duration = 5
         game.frameRate = 15
+        game._pass = None
+        game._playFor = game.duration
+
+    def startPass(game, animation, **kwargs):
+        """
+            Plays animation through once on game.animations, taking the same arguments
+            as LSAnimator.start(), and returns its LSPlayback. The engine won't end the
+            screensaver while the pass is playing, see passOver().
+        """
+        game._playFor = game.duration
+        game.duration = 0
+        game._pass = game.animations.start(animation, **kwargs)
+        return game._pass
+
+    def passOver(game):
+        """
+            Returns True when the last pass started has played through and the next
+            one can start. On the tick a pass ends the screensaver's duration comes
+            back into force, and this returns False so that the engine can end the
+            screensaver then rather than cut off the next pass.
+        """
+        if game._pass is None:
+            return True
+        if game._pass.playing:
+            return False
+        game._pass = None
+        game.duration = game._playFor
+        return False
+
+    @classmethod
+    def buildBank(cls, rows, cols):
+        """
+            Override to build the animations or frames a screensaver needs ahead of
+            time. It is called once per floor size, usually in the background before
+            the screensaver is first shown, and whatever it returns is shared by every
+            game of the screensaver on a floor that size as game.bank.
+        """
+        return None
+
+    @classmethod
+    def getBank(cls, rows, cols):
+        """
+            Returns the screensaver's bank for a floor of rows by cols, building it
+            first if it hasn't been built yet
+        """
+        with cls._banksLock:
+            bank = cls._banks.setdefault((cls, rows, cols), _FrameBank())
+        with bank.lock:
+            if not bank.built:
+                bank.contents = cls.buildBank(rows, cols)
+                bank.built = True
+        return bank.contents
+
+    @property
+    def bank(game):
+        return game.getBank(game.rows, game.cols)
+
+def prepareScreenSavers(savers, rows, cols):
+    """
+        Builds the banks of each of savers for a floor of rows by cols in a background
+        thread, so that switching to one later costs the game thread nothing. Returns
+        the thread.
+    """
+    def build():
+        for Saver in savers:
+            try:
+                Saver.getBank(rows, cols)
+            except AttributeError:
+                pass                # Not an LSScreenSaver, nothing to build
+            except Exception as e:  # Left to be tried again when the screensaver starts
+                print("WARNING: Could not prepare {:s}: {:s}".format(Saver.__name__, str(e)))
+    thread = threading.Thread(target=build, name="saver-banks")
+    thread.daemon = True
+    thread.start()
+    return thread
 
 
 from lightsweeper import lsscreensavers
@@ -109,45 +217,198 @@ from lightsweeper import lsscreensavers
 SAVERS = lsscreensavers.screensaverList
 
 
+class LSGovernor():
+    """
+        Turns the floor down while nobody is on it. Once no tile has been stepped on
+        or off for idleAfter seconds, and nobody is standing on the floor, the game
+        runs at no more than idleFrameRate (which also slows the views, as they are
+        redrawn once a frame) and the sensors are swept every idlePollInterval
+        seconds instead of flat out. The first step puts everything back at once:
+        the frame being waited out is cut short, so the floor takes at most
+        idlePollInterval to notice someone.
+
+        Attributes:
+            idleAfter (float):          Seconds without a step before the floor counts as idle
+            idleFrameRate (int):        The most frames a second to run while idle
+            idlePollInterval (float):   Seconds between sensor sweeps while idle
+            idle (bool):                True while the floor is idle
+    """
+
+    def __init__(self, idleAfter=60, idleFrameRate=10, idlePollInterval=0.1, clock=time.monotonic):
+        self.idleAfter = idleAfter
+        self.idleFrameRate = idleFrameRate
+        self.idlePollInterval = idlePollInterval
+        self.clock = clock
+        self.idle = False
+        self.floor = None
+        self.lastActivity = clock()
+        self._wake = threading.Event()
+
+    def attach(self, floor):
+        """
+            Sets the floor whose sensor sweeps are slowed while idle
+        """
+        self.floor = floor
+        self._apply()
+
+    def activity(self):
+        """
+            Tells the governor a tile was stepped on or off
+        """
+        self.lastActivity = self.clock()
+        if self.idle:
+            self.idle = False
+            print("LSGovernor: Waking up")
+            self._apply()
+            self._wake.set()        # Cut the idle frame short, ticks keep to their schedule otherwise
+
+    def update(self, occupied=False):
+        """
+            Called once a frame, returns True while the floor is idle. occupied is
+            whether anybody is standing on the floor.
+        """
+        if occupied:
+            self.lastActivity = self.clock()
+        elif not self.idle and self.clock() - self.lastActivity >= self.idleAfter:
+            self.idle = True
+            print("LSGovernor: Nobody is on the floor, idling")
+            self._apply()
+        return self.idle
+
+    def frameRate(self, requested):
+        """
+            Returns the frame rate to run a game that asks for requested at
+        """
+        if self.idle and (requested > self.idleFrameRate or requested < 0):
+            return self.idleFrameRate
+        return requested
+
+    def wait(self, seconds):
+        """
+            Sleeps for seconds, or until a step wakes the floor from idle. Returns True
+            if it was woken.
+        """
+        if seconds > 0 and self._wake.wait(seconds):
+            self._wake.clear()
+            return True
+        return False
+
+    def _apply(self):
+        if self.floor is not None:
+            self.floor.pollInterval = self.idlePollInterval if self.idle else 0
+
+
+class _StatusLine(threading.Thread):
+    # Prints the engine's frame rate every STATUS_INTERVAL seconds, so the game
+    # thread doesn't have to write to the console every frame
+
+    def __init__(self, engine):
+        threading.Thread.__init__(self, name="engine-status")
+        self.daemon = True
+        self.engine = engine
+        (self.lastTicks, self.lastTime) = (engine.frames, engine.clock())
+
+    def run(self):
+        while True:
+            time.sleep(STATUS_INTERVAL)
+            self.show()
+
+    def show(self):
+        spaces = " " * (52)
+        (ticks, now) = (self.engine.frames, self.engine.clock())
+        line = "{1:s}{0:.4f} FPS".format((ticks - self.lastTicks) / (now - self.lastTime), spaces)
+        if self.engine.droppedFrames > 0:
+            line += " ({:d} dropped)".format(self.engine.droppedFrames)
+        print(line, end="\r")
+        (self.lastTicks, self.lastTime) = (ticks, now)
+
+
 #enforces the framerate, pushes sensor data to games, and selects games
 class LSGameEngine():
+    """
+        Runs games. Each tick the engine pushes sensor data to the game and calls its
+        heartbeat; game.frameRate sets how many ticks there are a second. Ticks are
+        kept to a fixed schedule on the monotonic clock, so one that runs late
+        doesn't push back the ones after it. What happens to ticks that were missed
+        is up to policy: CATCH_UP runs them straight away and DROP skips them.
+
+        Output, stepping the animations and the display's heartbeat, happens on
+        ticks that are on time, at most game.outputRate (or outputRate if the game
+        doesn't set one) times a second.
+
+        Attributes:
+            frames (int):           The number of ticks run so far
+            droppedFrames (int):    The number of ticks skipped because they were due too long ago
+            stats (LSFrameStats):   Frame time statistics for the current game, see frameStats()
+            statsHistory (deque):   The statistics of the last STATS_HISTORY games, oldest first
+            profiler (LSProfiler):  Samples the game and I/O threads when SIGUSR1 arrives, or while
+                                    the file named by profileControl exists, see lsprofile
+    """
+
     initLock = threading.Event()
+    THREADED = True         # Whether the floor runs its own I/O threads, see lsasync
     SIMULATED_FLOOR = True
     CONSOLE = False
     numPlays = numLoops = 0
+    maxCatchUp = 5          # The most ticks CATCH_UP will run late before it gives up on them
     _warnings = []
 
-    def __init__(self, GAME, floorConfig=None, loop=True, cartridgeReader=False, init=True):
+    def __init__(self, GAME, floorConfig=None, loop=True, cartridgeReader=False, init=True, ioProcess=False, emulator=None, governor=True,
+                 policy=CATCH_UP, outputRate=None, profileControl=None):
         self.cartridgeReader = cartridgeReader
         self.loop = loop
+        self.clock = time.monotonic
         self.wait = time.sleep
+        if policy not in (CATCH_UP, DROP):
+            raise ValueError("Unknown timing policy: {:s}".format(str(policy)))
+        self.policy = policy
+        self.outputRate = outputRate
+        if governor is True:
+            governor = LSGovernor()
+        self.governor = governor or None    # Pass False to run flat out all the time, or an LSGovernor to tune it
         if floorConfig is None:
             conf = LSFloorConfig()
             conf.selectConfig()
         else:
             conf = LSFloorConfig(floorConfig)
+        if ioProcess is True:
+            conf.ioProcess = True   # Serial I/O runs in its own process, see lsprocess
         if conf.containsVirtual() is True:
             self.REAL_FLOOR = False
         else:
             self.REAL_FLOOR = True
 
         self.audio = LSAudio(initSound=init)
-        self.display = LSDisplay(conf=conf, eventCallback = self.handleTileStepEvent, initScreen=init)
+        self.display = LSDisplay(conf=conf, eventCallback = self.handleTileStepEvent, initScreen=init, emulator=emulator,
+                                 threaded=self.THREADED)
 
         self.ROWS = conf.rows
         self.COLUMNS = conf.cols
+        if self.governor is not None:
+            self.governor.attach(self.display.floor)
+            self.wait = self.governor.wait
         os.system('cls' if os.name == 'nt' else 'clear')
         print("Board size is {:d}x{:d}".format(self.ROWS, self.COLUMNS))
             
         self.GAME = GAME
-        self.moves = []
-        self.sensorMatrix = defaultdict(lambda: defaultdict(int))
+        self.sensorMatrix = LSSensorMatrix(self.ROWS, self.COLUMNS, threshold=_SENSOR_THRESHOLD)
+        self.saverBanks = prepareScreenSavers(SAVERS, self.ROWS, self.COLUMNS)
+        self.animations = LSAnimator(self.display)
+        self.stats = None
+        self.statsHistory = deque(maxlen=STATS_HISTORY)
         self.currentGame = None
+        self.profiler = LSProfiler(self, threads=PROFILED_THREADS + [threading.current_thread().name])
+        self.profiler.watch(profileControl)
         self.newGame(self.GAME)
 
         #these are for bookkeeping
         self.frames = 0
+        self.droppedFrames = 0
         self.frameRenderTime = 0
+        self._nextTick = None           # When the next tick is due
+        self._nextOutput = None         # When output is next due, if it is limited
+        self._late = False              # Whether the last tick finished after the next one was due
+        self._status = None
         
         # This lock prevents handleTileStepEvent() from being run by polling loops before init is complete
         self.initLock.set()
@@ -162,10 +423,13 @@ class LSGameEngine():
             GAME = Game
         self.currentGame = GAME.__name__
 
+        self._rollStats()
         print("LSGameEngine: Starting {:s}...".format(self.currentGame))
+        self.animations.stop()      # The last game's animations go with it
         self.game = GAME(self.display, self.audio, self.ROWS, self.COLUMNS, self.cartridgeReader)
-        self.startGame = time.time()
+        self.startGame = self.clock()
         self.game.sensors = self.sensorMatrix
+        self.game.animations = self.animations
         self.numLoops += 1
         if not isinstance(self.game, LSScreenSaver):
             self.numPlays += 1
@@ -176,7 +440,9 @@ class LSGameEngine():
             self._warnOnce("{:s} has no init() method.".format(self.currentGame))
         
     def beginLoop(self, plays = 0):
-        self.fpsLog = dict()
+        if self._status is None:
+            self._status = _StatusLine(self)
+            self._status.start()
         while True:
             if plays is not 0 and self.numPlays <= plays:
                 self.enterFrame()
@@ -198,9 +464,19 @@ class LSGameEngine():
         input("--Press any key to exit--\n")
 #        self.display.floor.saveAndExit(0)
 
+    @property
+    def moves(self):
+        # The tiles that are currently stepped on, in the order they were stepped on
+        return self.sensorMatrix.pressed()
+
     def handleTileStepEvent(self, row, col, sensorPcnt):
         self.initLock.wait()
-        if int(sensorPcnt) is 0:
+        # Only trigger > n%, hack to guard against phantom sensors
+        # TODO: This but better
+        change = self.sensorMatrix.update(row, col, sensorPcnt)
+        if change != 0 and self.governor is not None:
+            self.governor.activity()
+        if change < 0:
             try:
                 self.game.stepOff(row, col)
             except AttributeError as e:   # Game has no stepOff() method
@@ -209,23 +485,15 @@ class LSGameEngine():
                 else:
                     raise(e)
          #   print("stepOff: ({:d},{:d})".format(row, col)) # Debugging
-            self.moves = [x for x in self.moves if x[0] is not row and x[1] is not col]
-        else:
-            if self.sensorMatrix[row][col] is 0:
-                if sensorPcnt > _SENSOR_THRESHOLD:# Only trigger > n%, hack to guard against phantom sensors
-                                            # TODO: This but better
-             #   if sensorPcnt > 0:
-                    try:
-                        self.game.stepOn(row, col)
-                    except AttributeError as e:   # Game has no stepOn() method
-                        if "object has no attribute 'stepOn'" in str(e):
-                            self._warnOnce("{:s} has no stepOn() method.".format(self.currentGame))
-                        else:
-                            raise(e)
-                 #   print("stepOn: ({:d},{:d})".format(row, col)) # Debugging
-                    m = (row, col)
-                    self.moves.append(m)
-        self.sensorMatrix[row][col] = int(sensorPcnt)
+        elif change > 0:
+            try:
+                self.game.stepOn(row, col)
+            except AttributeError as e:   # Game has no stepOn() method
+                if "object has no attribute 'stepOn'" in str(e):
+                    self._warnOnce("{:s} has no stepOn() method.".format(self.currentGame))
+                else:
+                    raise(e)
+         #   print("stepOn: ({:d},{:d})".format(row, col)) # Debugging
 
     def pauseGame (self):
         print("Game is paused.")
@@ -234,52 +502,127 @@ class LSGameEngine():
         print("Game resuming...")
 
     def enterFrame(self):
-        if self.game.duration is not 0:
-            playTime = (time.time() - self.startGame)
-            if playTime > self.game.duration:
-                self.newGame(self.GAME)
-        startEnterFrame = time.time()
+        (stats, startEnterFrame) = self._startTick()
         if not self.game.ended:
             self.game.heartbeat(self.moves)
-            self.display.heartbeat()
-     #       self.audio.heartbeat()
+            self._output(stats, startEnterFrame)
         else:
             self.newGame(SAVERS)    # Super hacky, should be in gameOver
          #   self.newGame(self.GAME)
-        frameRenderTime = (time.time() - startEnterFrame)
-        self.wait(self.padFrame(frameRenderTime))
+        pause = self._endTick(stats, startEnterFrame)
+        startSleep = self.clock()
+        if self.wait(pause):
+            self._nextTick = None           # Woken from idle, don't wait out the rest of the idle schedule
+        stats.record("sleep", self.clock() - startSleep)
+
+    def _startTick(self):
+        # Starts the next game if this one has run its course, then readies the
+        # sensors for the heartbeat. Returns the tick's statistics and start time
+        if self.game.duration is not 0:
+            playTime = (self.clock() - self.startGame)
+            if playTime > self.game.duration:
+                self.newGame(self.GAME)
+        stats = self.stats
+        startEnterFrame = self.clock()
+        if self._nextTick is None:
+            self._nextTick = startEnterFrame
+        self.sensorMatrix.nextFrame()
+        if self.governor is not None:
+            self.governor.update(occupied=self.sensorMatrix.numPressed() > 0)
+        return (stats, startEnterFrame)
+
+    def _output(self, stats, startEnterFrame):
+        # Called once the game's heartbeat is done, steps the animations and sends the tick to the floor if output is due
+        heartbeatDone = self.clock()
+        stats.record("heartbeat", heartbeatDone - startEnterFrame)
+        if self._outputDue(startEnterFrame):
+            self.animations.step()
+            animationsDone = self.clock()
+            self.display.heartbeat()
+            stats.record("animations", animationsDone - heartbeatDone)
+            stats.record("display", self.clock() - animationsDone)
+     #       self.audio.heartbeat()
 
-    def padFrame(self, renderTime):
+    def _endTick(self, stats, startEnterFrame):
+        # Counts the tick and returns how long to wait before the next one
+        self.frames += 1
+        stats.ticks += 1
+        frameRenderTime = (self.clock() - startEnterFrame)
+        stats.record("frame", frameRenderTime)
+        return self.padFrame()
+
+    def frameStats(self, game=None):
+        """
+            Returns a summary of the frame time statistics of the current game, or of
+            the last finished game called game, see LSFrameStats.summary()
+        """
+        if game is None or game == self.stats.name:
+            return self.stats.summary()
+        for stats in reversed(self.statsHistory):
+            if stats.name == game:
+                return stats.summary()
+        raise KeyError("No frame statistics for {:s}".format(game))
+
+    def _rollStats(self):
+        # Finishes the last game's statistics and starts new ones for the current game
+        if self.stats is not None:
+            self.stats.finish()
+            self.statsHistory.append(self.stats)
+            if self.stats.ticks > 0:
+                print("\n" + self.stats.report() + "\n")
+        self.stats = LSFrameStats(self.currentGame, clock=self.clock)
+
+    def _outputDue(self, now):
+        # Output is skipped while catching up, and limited to the output rate if there is one
+        if self._late:
+            return False
+        outputRate = self.game.outputRate if self.game.outputRate is not None else self.outputRate
+        if outputRate is None or outputRate <= 0:
+            return True
+        if self._nextOutput is not None and now < self._nextOutput:
+            return False
+        if self._nextOutput is None or now - self._nextOutput > 1.0/outputRate:
+            self._nextOutput = now          # Too far behind to keep to the old schedule
+        self._nextOutput += 1.0/outputRate
+        return True
+
+    def padFrame(self):
+        """
+            Returns how long to wait before the next tick is due
+        """
         if self.game.frameRate is 0:
             self.pauseGame()
-        spaces = " " * (52)
-        fps = 1.0/renderTime
-        fpsEntry = int(fps) if fps < self.game.frameRate else int(self.game.frameRate)
-        if self.numLoops in self.fpsLog.keys():
-            self.fpsLog[self.numLoops].append(fpsEntry)
-        else:
-            if self.numLoops > 1:
-                try:
-                    data = self.fpsLog[self.numLoops-1]
-                    avg = int(sum(data)/len(data))
-                    mod = max(set(data), key=data.count)
-                    mrg = int(min(data) + max(data)/2)
-                 #   print(data) # Debugging
-                    del(data)
-                    print("\nStats for: {:s}".format(self.lastGame))
-                    statsString="  FrameRate: (average: {:d}fps) (mode: {:d}fps) (midrange: {:d}fps)"
-                    print(statsString.format(avg, mod, mrg))
-                    print("")
-                except KeyError:
-                    pass
-            self.fpsLog[self.numLoops] = [fpsEntry]
-        if fps < self.game.frameRate or self.game.frameRate < 0:
-            print("{1:s}{0:.4f} FPS".format(1.0/renderTime, spaces), end="\r")
+            self._nextTick = None           # Start a new schedule after a pause
+        frameRate = self.game.frameRate
+        if self.governor is not None:
+            frameRate = self.governor.frameRate(frameRate)
+        if frameRate < 0 or self._nextTick is None:    # No limit
+            self._nextTick = None
+            self._late = False
             return(0)
+        interval = 1.0/frameRate
+        self._nextTick += interval
+        now = self.clock()
+        behind = now - self._nextTick
+        if behind < 0:
+            self._late = False
+            return(-behind)
+        missed = int(behind // interval)    # Ticks due before the one that is due now
+        if self.policy == DROP:
+            self._nextTick += missed * interval
+            self._dropped(missed)
+            self._late = False
+        elif missed >= self.maxCatchUp:
+            self._nextTick = now            # Too far behind, give up on catching up
+            self._dropped(missed)
+            self._late = False
         else:
-            print("{1:s}{0:.4f} FPS".format(self.game.frameRate, spaces), end="\r")
-            return((1.0/self.game.frameRate)-renderTime)
-        print(spaces * 2, end="\r")
+            self._late = True
+        return(0)
+
+    def _dropped(self, ticks):
+        self.droppedFrames += ticks
+        self.stats.dropped += ticks
 
     def _warnOnce(self, warning):
         if warning not in self._warnings:
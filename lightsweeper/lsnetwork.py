@@ -0,0 +1,115 @@
+""" The wire format used to move LightSweeper floor state between processes and hosts
+
+Every message starts with a five byte header: one byte for the message type and
+four bytes for the length of the payload that follows, both in network byte
+order. Tile updates are packed as fixed size records so a frame delta only costs
+seven bytes per changed tile.
+"""
+
+import json
+import socket
+import struct
+
+from lightsweeper import Colors
+
+HEADER = struct.Struct("!BI")
+TILE = struct.Struct("!HHBBB")          # row, col, red mask, green mask, blue mask
+FRAME = struct.Struct("!IH")            # frame number, number of tiles that follow
+LATCH = struct.Struct("!Id")            # frame number, time to latch at
+EVENT = struct.Struct("!dHHB")          # timestamp, row, col, sensor percent
+SIZE = struct.Struct("!HH")             # rows, cols
+
+
+class ConnectionClosed(IOError):
+    """ Custom exception returned when the other end of a connection has gone away. """
+    pass
+
+
+def sendMessage(sock, kind, payload=b""):
+    sock.sendall(HEADER.pack(kind, len(payload)) + payload)
+
+def recvExactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionClosed("Connection closed by peer")
+        data.extend(chunk)
+    return bytes(data)
+
+def recvMessage(sock):
+    """
+        Blocks until a whole message has arrived, then returns it as the tuple (type, payload)
+    """
+    (kind, length) = HEADER.unpack(recvExactly(sock, HEADER.size))
+    return (kind, recvExactly(sock, length))
+
+def packJSON(obj):
+    return json.dumps(obj).encode("utf-8")
+
+def unpackJSON(payload):
+    return json.loads(payload.decode("utf-8"))
+
+def packTiles(frameNumber, tiles):
+    """
+        Packs a list of (row, col, (red, green, blue)) tuples into a frame delta
+    """
+    out = [FRAME.pack(frameNumber, len(tiles))]
+    for (row, col, (r, g, b)) in tiles:
+        out.append(TILE.pack(row, col, r, g, b))
+    return b"".join(out)
+
+def unpackTiles(payload):
+    """
+        Returns the tuple (frameNumber, tiles) where tiles is a list of (row, col, (red, green, blue))
+    """
+    (frameNumber, count) = FRAME.unpack_from(payload)
+    tiles = list()
+    for i in range(count):
+        (row, col, r, g, b) = TILE.unpack_from(payload, FRAME.size + i*TILE.size)
+        tiles.append((row, col, (r, g, b)))
+    return (frameNumber, tiles)
+
+def packEvent(timestamp, row, col, sensorPcnt):
+    return EVENT.pack(timestamp, row, col, min(max(int(sensorPcnt), 0), 255))
+
+def unpackEvent(payload):
+    return EVENT.unpack(payload)
+
+def tileMasks(tile):
+    """
+        Returns the (red, green, blue) segment masks currently shown by tile
+    """
+    s = tile.segments
+    return tuple(Colors.segmentsToRgb([s["a"], s["b"], s["c"], s["d"], s["e"], s["f"], s["g"]]))
+
+def parseAddress(address, defaultHost="127.0.0.1"):
+    """
+        Turns "host:port" or "port" into a (host, port) tuple
+    """
+    (host, _, port) = address.strip().rpartition(":")
+    return (host or defaultHost, int(port))
+
+def listen(host="127.0.0.1", port=0):
+    """
+        Returns a listening TCP socket, port 0 picks any free port
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(5)
+    return server
+
+def accept(server):
+    """
+        Waits for a connection on a listening socket, returns the tuple (socket, address)
+    """
+    (sock, peer) = server.accept()
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return (sock, peer)
+
+def connect(address, timeout=10):
+    sock = socket.create_connection(address, timeout)
+    sock.settimeout(None)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
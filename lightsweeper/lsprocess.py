@@ -0,0 +1,246 @@
+""" Runs the serial I/O of a LightSweeper floor in its own process
+
+When everything shares one interpreter a slow game heartbeat holds up the
+threads that poll the sensors. LSIOProcessFloor is a floor view that runs in
+the game's process and hands all of LSRealFloor's work to a second process, so
+the game and the serial ports each get a core of their own.
+
+The two processes share two blocks of memory:
+
+    LSSharedFrameBuffer     A double buffer of tile masks. The game writes each frame
+                            into the back buffer and then flips it to the front, the
+                            I/O process copies out the front buffer and sends the
+                            tiles that changed to the floor.
+
+    LSSharedEventRing       A ring of sensor events written by the I/O process and
+                            read by the game.
+
+Select it by adding IOPROCESS = yes to lightsweeper.conf or by passing
+ioProcess=True to LSGameEngine.
+"""
+
+from lightsweeper.lsfloor import LSFloor
+from lightsweeper.lsconfig import LSFloorConfig
+from lightsweeper import lsnetwork
+
+from multiprocessing import shared_memory
+
+import atexit
+import multiprocessing
+import os
+import struct
+import time
+
+wait = time.sleep
+
+# How often (in seconds) each side checks the other for something new
+POLL_INTERVAL = 0.001
+
+# How many sensor events can be waiting for the game before new ones are dropped
+EVENT_RING_SIZE = 4096
+
+
+class LSSharedFrameBuffer():
+    """
+        A double buffer of tile masks in shared memory. Each frame is rows*cols*3
+        bytes, the red, green and blue masks of each tile in row-major order. There
+        is one writer and any number of readers.
+    """
+
+    _HEADER = struct.Struct("=IIII")      # frame number, front buffer, stop flag, unused
+
+    def __init__(self, rows, cols, name=None):
+        self.rows = rows
+        self.cols = cols
+        self.frameSize = rows * cols * 3
+        size = self._HEADER.size + 2*self.frameSize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self._HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def _header(self):
+        return self._HEADER.unpack_from(self.shm.buf, 0)
+
+    def _buffer(self, index):
+        start = self._HEADER.size + index*self.frameSize
+        return self.shm.buf[start:start+self.frameSize]
+
+    def publish(self, frame):
+        """
+            Writes frame, a bytes-like object of rows*cols*3 masks, and makes it the current frame
+        """
+        (frameNumber, front, stop, unused) = self._header()
+        back = 1 - front
+        self._buffer(back)[:] = frame
+        self._HEADER.pack_into(self.shm.buf, 0, frameNumber+1, back, stop, 0)
+
+    def frameNumber(self):
+        return self._header()[0]
+
+    def read(self):
+        """
+            Returns the tuple (frameNumber, frame) for the current frame
+        """
+        while True:
+            (frameNumber, front, stop, unused) = self._header()
+            frame = bytes(self._buffer(front))
+            if self._header()[0] == frameNumber:
+                return (frameNumber, frame)     # The writer didn't flip while we were copying
+
+    def stop(self):
+        (frameNumber, front, stop, unused) = self._header()
+        self._HEADER.pack_into(self.shm.buf, 0, frameNumber, front, 1, 0)
+
+    def stopped(self):
+        return self._header()[2] == 1
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class LSSharedEventRing():
+    """
+        A ring of sensor events in shared memory with a single writer and a single
+        reader. Events are (row, col, sensor-percent) tuples, as elsewhere.
+    """
+
+    _HEADER = struct.Struct("=QQ")        # events written, events read
+    _EVENT = struct.Struct("=dHHBxxx")    # timestamp, row, col, sensor percent
+
+    def __init__(self, capacity=EVENT_RING_SIZE, name=None):
+        self.capacity = capacity
+        size = self._HEADER.size + capacity*self._EVENT.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self._HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.dropped = 0
+
+    def put(self, row, col, sensorPcnt):
+        """
+            Adds an event to the ring, returns False if the reader has fallen too far behind
+        """
+        (written, read) = self._HEADER.unpack_from(self.shm.buf, 0)
+        if written - read >= self.capacity:
+            self.dropped += 1
+            return False
+        offset = self._HEADER.size + (written % self.capacity)*self._EVENT.size
+        self._EVENT.pack_into(self.shm.buf, offset, time.time(), row, col, min(max(int(sensorPcnt), 0), 255))
+        struct.pack_into("=Q", self.shm.buf, 0, written+1)      # Only the writer moves this count
+        return True
+
+    def get(self):
+        """
+            Returns the oldest unread event as the tuple (timestamp, row, col, sensor-percent), or None
+        """
+        (written, read) = self._HEADER.unpack_from(self.shm.buf, 0)
+        if read == written:
+            return None
+        offset = self._HEADER.size + (read % self.capacity)*self._EVENT.size
+        event = self._EVENT.unpack_from(self.shm.buf, offset)
+        struct.pack_into("=Q", self.shm.buf, 8, read+1)         # Only the reader moves this count
+        return event
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class LSIOProcessFloor(LSFloor):
+    """
+        This class extends LSFloor with methods for driving a floor whose serial I/O
+        runs in a separate process.
+    """
+
+    pollBlocks = True
+
+    def init(self):
+        self.frames = LSSharedFrameBuffer(self.rows, self.cols)
+        self.events = LSSharedEventRing()
+        self._frame = bytearray(self.rows * self.cols * 3)
+        self._published = None
+
+        context = multiprocessing.get_context("spawn")      # Don't fork the game's threads
+        self.process = context.Process(target=_runIOProcess,
+                                       args=(self.conf.fileName, self.conf.config, self.frames.name, self.events.name),
+                                       name="lsprocess-io")
+        self.process.daemon = True
+        self.process.start()
+        print("Started serial I/O process {:d}".format(self.process.pid))
+
+        atexit.register(self._saveState)
+
+    def _saveState(self):
+        # Stops the I/O process, which owns the calibration map and saves it on the way out
+        if self.frames.shm.buf is None:
+            return                          # Already stopped
+        self.frames.stop()
+        self.process.join(5)
+        self.frames.close()
+        self.frames.unlink()
+        self.events.close()
+        self.events.unlink()
+
+    def heartbeat(self):
+        frame = self._frame
+        for tile in self.tileList:
+            i = (tile.row*self.cols + tile.col) * 3
+            frame[i:i+3] = bytes(lsnetwork.tileMasks(tile))
+        if frame != self._published:
+            self.frames.publish(frame)
+            self._published = bytes(frame)
+
+    def pollEvents(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                wait(POLL_INTERVAL)
+                yield(())
+            else:
+                (timestamp, row, col, sensorPcnt) = event
+                yield((row, col, sensorPcnt))
+
+
+def _runIOProcess(fileName, config, frameName, ringName):
+    # Entry point of the I/O process, owns the real floor until the game stops it
+    if fileName is not None:
+        conf = LSFloorConfig(fileName)
+    else:
+        conf = LSFloorConfig(rows=max(c[0] for c in config)+1, cols=max(c[1] for c in config)+1)
+        conf.config = [tuple(c) for c in config]
+        conf.makeFloor()
+    conf.ioProcess = False
+    frames = LSSharedFrameBuffer(conf.rows, conf.cols, name=frameName)
+    events = LSSharedEventRing(name=ringName)
+    floor = LSFloor(conf, eventCallback=events.put)
+
+    shown = bytes(frames.frameSize)
+    lastFrame = 0
+    while not frames.stopped():
+        if frames.frameNumber() == lastFrame:
+            wait(POLL_INTERVAL)
+            continue
+        (lastFrame, frame) = frames.read()
+        for i in range(0, len(frame), 3):
+            if frame[i:i+3] != shown[i:i+3]:
+                (row, col) = divmod(i//3, conf.cols)
+                floor.setSegments(row, col, tuple(frame[i:i+3]))
+        shown = frame
+    frames.close()
+    events.close()
+    for view in floor.views:
+        try:
+            view._saveState()
+        except AttributeError:
+            pass
+    os._exit(0)         # The floor's polling threads never finish on their own
@@ -0,0 +1,177 @@
+""" A sampling profiler that can be switched on and off while a game is running
+
+LSProfiler looks at the stack of every thread a few hundred times a second with
+sys._current_frames() and counts how often each stack comes up. Nothing is
+hooked into the code being profiled, so it costs nothing while it is off and
+little while it is on. It runs for a window of seconds, then writes what it saw
+as collapsed stacks, one "game;thread;outermost;...;innermost count" line per
+stack, which flame graph tools read directly.
+
+LSGameEngine keeps one. Send the game SIGUSR1 to start or stop it:
+
+    kill -USR1 <pid>
+
+or give the engine a control file with LSGameEngine(..., profileControl="/tmp/lsprofile")
+and create the file to start profiling, optionally writing the window in seconds
+into it, and delete it to stop.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.005     # Seconds between samples
+WINDOW = 10                 # Seconds to profile for
+CONTROL_INTERVAL = 1        # Seconds between checks of the control file
+
+
+class LSProfiler():
+    """
+        Samples the engine's threads while it runs.
+
+        Attributes:
+            interval (float):       Seconds between samples
+            window (float):         Seconds to profile for once started
+            threads (list):         Only threads whose names contain one of these are
+                                    sampled, None samples every thread
+            directory (str):        Where reports are written
+            running (bool):         True while profiling
+            lastReport (str):       The file name of the last report written
+    """
+
+    def __init__(self, engine=None, interval=SAMPLE_INTERVAL, window=WINDOW, threads=None, directory=None):
+        self.engine = engine
+        self.interval = interval
+        self.window = window
+        self.threads = threads
+        self.directory = directory if directory is not None else os.getcwd()
+        self.running = False
+        self.lastReport = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def watch(self, controlFile=None, signalNumber=getattr(signal, "SIGUSR1", None)):
+        """
+            Starts and stops profiling when signalNumber arrives, and when controlFile
+            is created or deleted. The signal can only be set up from the main thread
+            and on systems that have it; otherwise only the control file is watched.
+        """
+        if signalNumber is not None:
+            try:
+                signal.signal(signalNumber, lambda signum, frame: self.toggle())
+            except ValueError:
+                print("WARNING: LSProfiler can only listen for signals from the main thread")
+        if controlFile is not None:
+            watcher = threading.Thread(target=self._watchFile, args=(controlFile,), name="profile-control")
+            watcher.daemon = True
+            watcher.start()
+
+    def _watchFile(self, controlFile):
+        present = False
+        while True:
+            if os.path.exists(controlFile) != present:
+                present = not present
+                if present:
+                    self.start(self._readWindow(controlFile))
+                else:
+                    self.stop()
+            time.sleep(CONTROL_INTERVAL)
+
+    def _readWindow(self, controlFile):
+        # The control file may hold the number of seconds to profile for
+        try:
+            with open(controlFile) as f:
+                return float(f.read().strip())
+        except (IOError, ValueError):
+            return None
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self, window=None):
+        """
+            Starts profiling for window seconds, or the profiler's window if window is None
+        """
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, args=(window or self.window,), name="profile-sampler")
+            self._sampler.daemon = True
+            self._sampler.start()
+        print("\nLSProfiler: Profiling for {:.0f} seconds".format(window or self.window))
+
+    def stop(self):
+        """
+            Stops profiling early, the report is written as usual
+        """
+        self._stop.set()
+
+    def _threadNames(self):
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        if self.threads is None:
+            return names
+        return dict((ident, name) for (ident, name) in names.items() if any(want in name for want in self.threads))
+
+    def _sample(self, window):
+        counts = dict()
+        samples = 0
+        me = threading.get_ident()
+        names = self._threadNames()
+        refreshNames = time.monotonic() + 1
+        end = time.monotonic() + window
+        try:
+            while not self._stop.is_set() and time.monotonic() < end:
+                if time.monotonic() > refreshNames:     # Threads come and go
+                    names = self._threadNames()
+                    refreshNames = time.monotonic() + 1
+                game = self._currentGame()
+                for (ident, frame) in sys._current_frames().items():
+                    if ident == me or ident not in names:
+                        continue
+                    stack = collapse(frame)
+                    key = "{:s};{:s};{:s}".format(game, names[ident], stack)
+                    counts[key] = counts.get(key, 0) + 1
+                samples += 1
+                self._stop.wait(self.interval)
+        finally:
+            self.running = False
+        self.lastReport = self.write(counts)
+        print("\nLSProfiler: {:d} samples written to {:s}".format(samples, self.lastReport))
+
+    def _currentGame(self):
+        game = getattr(self.engine, "currentGame", None)
+        return game if game is not None else "-"
+
+    def write(self, counts):
+        """
+            Writes counts, a dictionary of collapsed stacks to the number of times
+            each was seen, to a new report and returns its file name
+        """
+        fileName = os.path.join(self.directory, "lsprofile-{:s}-{:s}.folded".format(
+                                self._currentGame(), time.strftime("%Y%m%d-%H%M%S")))
+        with open(fileName, "w") as f:
+            for (stack, count) in sorted(counts.items(), key=lambda item: -item[1]):
+                f.write("{:s} {:d}\n".format(stack, count))
+        return fileName
+
+
+def collapse(frame):
+    """
+        Returns frame's stack as "outermost;...;innermost", each call written as
+        function (file:line the function starts on)
+    """
+    calls = list()
+    while frame is not None:
+        code = frame.f_code
+        calls.append("{:s} ({:s}:{:d})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    calls.reverse()
+    return ";".join(calls)
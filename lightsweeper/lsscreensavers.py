@@ -2,48 +2,75 @@ import random
 
 from lightsweeper.lsgame import *
 from lightsweeper import lsanimate
+from lightsweeper import lseffects
 
 MESSAGE = "LightSweeper"
 
 class FlyingWords(LSScreenSaver):
-    
+
+    @classmethod
+    def buildBank(cls, rows, cols):
+        # The message scrolling across a row in every color, and a blank floor to show it on
+        texts = dict()
+        for color in range(1, 8):
+            texts[color] = lsanimate.ScrollingText(MESSAGE, color=color, width=cols)
+            texts[color].numFrames()     # Builds the frames now
+        surface = lsanimate.LSFrameGen(rows, cols)
+        surface.fill((0,0,0))
+        blank = lsanimate.LSAnimation()
+        blank.addFrame(surface.get())
+        return (texts, blank)
+
     def init(self):
-        self.text = lsanimate.ScrollingText(MESSAGE, width=self.cols)
-        self.surface = lsanimate.LSFrameGen(self.rows, self.cols)
-        self.surface.fill((0,0,0))
-        self.lastRow = random.randint(0, self.surface.rows-1)
+        (self.texts, self.blank) = self.bank
+        self.color = Colors.WHITE
+        self.lastRow = random.randint(0, self.rows-1)
+        # The rest of the floor is blanked every frame, under the message
+        self.animations.start(self.blank, loop=True)
 
     def heartbeat(self, activeSensors):
-        self.text.color = Colors.RANDOM(exclude=self.text.color)
-        outAnimation = lsanimate.LSAnimation()
-        Frame = self.text.nextFrame()
-        randomRow = self.lastRow = random.choice([x for x in range(0, self.surface.rows) if x != self.lastRow])
-        for frame in Frame:
-            outAnimation.addFrame(lsanimate.mergeFrames(self.surface.get(), frame, offset=(randomRow,0)))
-        outAnimation.play(self.display, frameRate=5)
+        if not self.passOver():
+            return
+        self.color = Colors.RANDOM(exclude=self.color)
+        randomRow = self.lastRow = random.choice([x for x in range(0, self.rows) if x != self.lastRow])
+        self.startPass(self.texts[self.color], offset=(randomRow,0), priority=1, frameRate=5)
 
 
 class RainbowZipper(LSScreenSaver):
-    def init(self):
-        text = lsanimate.ScrollingText(MESSAGE, color=Colors.RAINBOW(), width=self.cols)
-        self.framesL = text._frames[:]
-        text.direction = "right"
-        self.framesR = text._frames[:]
-        self.surface = lsanimate.LSFrameGen(self.rows, self.cols)
-        self.surface.fill((0,0,0))
 
-    def heartbeat(self, activeSensors):
+    @classmethod
+    def buildBank(cls, rows, cols):
+        text = lsanimate.ScrollingText(MESSAGE, color=Colors.RAINBOW(), width=cols)
+        framesL = text._frames[:]
+        text.direction = "right"
+        framesR = text._frames[:]
+        surface = lsanimate.LSFrameGen(rows, cols)
+        surface.fill((0,0,0))
         outAnimation = lsanimate.LSAnimation()
-        for frame in map(lambda x, y: (x, y), self.framesL, self.framesR):
-            thisFrame = self.surface.get()
-            for i in range(self.surface.rows):
-                if i % 2 is 0:
-                    f = frame[0][:]
+        for frame in map(lambda x, y: (x, y), framesL, framesR):
+            thisFrame = surface.get()
+            for i in range(rows):
+                if i % 2 == 0:
+                    f = frame[0]
                 else:
-                    f = frame[1][:]
-                thisFrame = lsanimate.mergeFrames(thisFrame, f, offset=(i,0))
+                    f = frame[1]
+                thisFrame = lsanimate.blitFrame(thisFrame, f, offset=(i,0))
             outAnimation.addFrame(thisFrame)
-        outAnimation.play(self.display, frameRate=10)
+        return outAnimation
+
+    def heartbeat(self, activeSensors):
+        if self.passOver():
+            self.startPass(self.bank, frameRate=10)
+
+class Puddles(LSScreenSaver):
+    # A demo of lseffects, not in the rotation: run it with LSGameEngine(Puddles)
+    def init(self):
+        self.ripples = lseffects.Ripples(self.rows, self.cols, palette=[lseffects.NO_UPDATE] + lseffects.ramp(Colors.WHITE)[1:])
+        self.animations.start(lseffects.Plasma(self.rows, self.cols, palette=lseffects.OCEAN))
+        self.animations.start(self.ripples, priority=1)
+
+    def stepOn(self, row, col):
+        self.ripples.stepOn(row, col)
 
 class RandDot(LSScreenSaver):
     def heartbeat(self, activeSensors):
@@ -0,0 +1,162 @@
+""" Keeps track of a floor's pressure sensors and answers questions about them """
+
+from array import array
+from collections import OrderedDict
+
+import threading
+import time
+
+class LSSensorMatrix():
+    """
+        This class holds the most recent reading of every sensor on the floor in a
+        single flat array which is updated in place as events arrive, so games can
+        ask what is going on underfoot without walking the whole floor.
+
+        Readings are stored row-major, so sensors[row][col] still works the way it
+        did when the engine kept them in a nested dictionary.
+
+        Attributes:
+            rows (int):             The number of rows
+            cols (int):             The number of columns
+            threshold (int):        A tile counts as stepped on once its reading goes above this
+            values (array):         The latest reading of every sensor, indexed by row*cols+col
+            mask (bytearray):       1 for every tile that is currently stepped on, 0 otherwise
+    """
+
+    def __init__(self, rows, cols, threshold=0, clock=time.time):
+        self.rows = rows
+        self.cols = cols
+        self.threshold = threshold
+        self.clock = clock
+
+        self.values = array('B', bytes(rows*cols))
+        self.mask = bytearray(rows*cols)
+
+        self._pressedAt = OrderedDict()     # index -> time it was stepped on, oldest first
+        self._fresh = list()                # Tiles stepped on during the current frame
+        self._newlyPressed = list()         # Tiles stepped on during the last frame
+        self._lock = threading.Lock()
+
+    def __getitem__(self, row):
+        start = row * self.cols
+        return memoryview(self.values)[start:start+self.cols]
+
+    def _index(self, row, col):
+        if row < 0 or row >= self.rows or col < 0 or col >= self.cols:
+            raise IndexError("No sensor at ({:d},{:d})".format(row, col))
+        return row * self.cols + col
+
+    def _rowCol(self, index):
+        return divmod(index, self.cols)
+
+    def update(self, row, col, reading):
+        """
+            Records a new reading for the sensor at row, col.
+
+            Returns:
+                1                       if the tile has just been stepped on
+                -1                      if the tile has just been stepped off
+                0                       otherwise
+        """
+        i = self._index(row, col)
+        reading = min(max(int(reading), 0), 255)
+        with self._lock:
+            self.values[i] = reading
+            if self.mask[i]:
+                if reading == 0:
+                    self.mask[i] = 0
+                    del self._pressedAt[i]
+                    return -1
+            elif reading > self.threshold:
+                self.mask[i] = 1
+                self._pressedAt[i] = self.clock()
+                self._fresh.append(i)
+                return 1
+        return 0
+
+    def nextFrame(self):
+        """
+            Marks the start of a new frame, this is called once per frame by LSGameEngine.
+        """
+        with self._lock:
+            self._newlyPressed = self._fresh
+            self._fresh = list()
+
+    def clear(self):
+        """
+            Forgets every reading.
+        """
+        with self._lock:
+            self.values[:] = array('B', bytes(self.rows*self.cols))
+            self.mask[:] = bytes(self.rows*self.cols)
+            self._pressedAt.clear()
+            self._fresh = list()
+            self._newlyPressed = list()
+
+    def isPressed(self, row, col):
+        return self.mask[self._index(row, col)] == 1
+
+    def pressedMask(self):
+        """
+            Returns a snapshot of the floor as a bytes object, with a 1 at row*cols+col for
+            every tile that is stepped on.
+        """
+        return bytes(self.mask)
+
+    def pressed(self):
+        """
+            Returns a list of (row, col) tuples for every tile that is stepped on, in
+            the order they were stepped on.
+        """
+        with self._lock:
+            return [self._rowCol(i) for i in self._pressedAt]
+
+    def numPressed(self):
+        return len(self._pressedAt)
+
+    def newlyPressed(self):
+        """
+            Returns a list of (row, col) tuples for the tiles that were stepped on
+            during the last frame.
+        """
+        return [self._rowCol(i) for i in self._newlyPressed]
+
+    def heldLongerThan(self, seconds):
+        """
+            Returns a list of (row, col) tuples for the tiles that have been stepped
+            on for at least the given number of seconds.
+        """
+        cutoff = self.clock() - seconds
+        held = list()
+        with self._lock:
+            for i, pressedAt in self._pressedAt.items():
+                if pressedAt > cutoff:
+                    break               # Everything after this was stepped on more recently
+                held.append(self._rowCol(i))
+        return held
+
+    def _regionSlices(self, row, col, rows, cols):
+        # Yields the start and end of each row of the given region, clipped to the floor
+        firstRow = max(row, 0)
+        lastRow = min(row + rows, self.rows)
+        firstCol = max(col, 0)
+        lastCol = min(col + cols, self.cols)
+        if firstCol >= lastCol:
+            return
+        for r in range(firstRow, lastRow):
+            start = r * self.cols
+            yield (start + firstCol, start + lastCol)
+
+    def regionSum(self, row, col, rows, cols):
+        """
+            Returns the total of all readings in the rows x cols region whose top left
+            corner is at row, col.
+        """
+        return sum(sum(self.values[start:end]) for (start, end) in self._regionSlices(row, col, rows, cols))
+
+    def regionCount(self, row, col, rows, cols):
+        """
+            Returns the number of tiles that are stepped on in the rows x cols region
+            whose top left corner is at row, col.
+        """
+        return sum(sum(self.mask[start:end]) for (start, end) in self._regionSlices(row, col, rows, cols))
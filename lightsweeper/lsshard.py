@@ -0,0 +1,296 @@
+""" Spreads one logical LightSweeper floor across several worker processes or hosts
+
+A single process that owns every serial port is the limit on how large a floor
+can get. LSShardedFloor is a floor view that runs in the same process as the
+game. It splits the ports in the floor configuration between a number of
+LSShardWorker processes, each of which owns its ports exactly the way
+LSRealFloor does when everything runs in one process.
+
+Each heartbeat the view sends every worker the tiles of its shard that changed
+since the last frame, followed by a latch message carrying the frame number and
+the time at which every shard should put the frame on the floor. Workers send
+sensor events back with the time they were read, plus any calibration changes,
+which the view journals against the .floor file it was loaded from.
+
+Shards are selected with the FLOORSHARDS directive in lightsweeper.conf:
+
+    FLOORSHARDS = auto                              # One local worker process per port
+    FLOORSHARDS = 10.0.0.2:4117, 10.0.0.3:4117      # Workers already running on other hosts
+
+Workers on other hosts are started with:
+
+    python -m lightsweeper.lsshard 0.0.0.0:4117
+
+Across hosts the latch time is wall clock time, so the hosts' clocks should be
+kept in step with NTP.
+"""
+
+from lightsweeper.lsfloor import LSFloor
+from lightsweeper.lsconfig import LSFloorConfig
+from lightsweeper import lsnetwork
+
+from collections import defaultdict
+from queue import PriorityQueue
+
+import atexit
+import multiprocessing
+import sys
+import threading
+import time
+
+# Message types
+HELLO = 1           # coordinator -> worker: the configuration entries for the shard
+FRAME = 2           # coordinator -> worker: tiles that changed since the last frame
+LATCH = 3           # coordinator -> worker: show the frame at the given time
+EVENT = 4           # worker -> coordinator: a timestamped sensor reading
+CALIBRATION = 5     # worker -> coordinator: calibration entries that changed
+BYE = 6             # coordinator -> worker: blank the shard and wait for a new coordinator
+
+# How far in the future (in seconds) frames are latched, gives every shard time to receive the frame
+LATCH_DELAY = 0.01
+
+
+def partitionPorts(config, numShards):
+    """
+        Splits the configuration entries of a floor between numShards shards by port
+        and returns a list with the configuration entries of each shard.
+    """
+    byPort = defaultdict(list)
+    for cell in config:
+        byPort[cell[2]].append(cell)
+    shards = [list() for _ in range(min(numShards, len(byPort)))]
+    for i, port in enumerate(sorted(byPort.keys())):
+        shards[i % len(shards)].extend(byPort[port])
+    return shards
+
+
+class LSShardedFloor(LSFloor):
+    """
+        This class extends LSFloor with methods for driving a floor whose ports are
+        owned by LSShardWorker processes.
+    """
+
+    pollBlocks = True
+
+    def init(self):
+        self.frameNumber = 0
+        self._events = PriorityQueue()
+        self._shown = dict()                # (row, col) -> the masks the shards are showing
+        self._sendLock = threading.Lock()
+
+        if self.conf.shards is None or self.conf.shards.strip().lower() == "auto":
+            numPorts = len(set(cell[2] for cell in self.conf.config))
+            addresses = [spawnWorker() for _ in range(numPorts)]
+        else:
+            addresses = [lsnetwork.parseAddress(a) for a in self.conf.shards.split(",")]
+
+        self.shards = list()
+        self._shardOf = dict()
+        for (shardID, config) in enumerate(partitionPorts(self.conf.config, len(addresses))):
+            print("Connecting to shard {:d} at {:s}:{:d}".format(shardID, addresses[shardID][0], addresses[shardID][1]))
+            sock = lsnetwork.connect(addresses[shardID])
+            lsnetwork.sendMessage(sock, HELLO, lsnetwork.packJSON({"shard": shardID, "config": config}))
+            self.shards.append(sock)
+            for (row, col, port, address, calibration) in config:
+                self._shardOf[(row, col)] = shardID
+            receiver = threading.Thread(target=self._receive, args=(sock,), name="shard-{:d}-receiver".format(shardID))
+            receiver.daemon = True
+            receiver.start()
+
+        atexit.register(self._saveState)
+
+    def _saveState(self):
+        for sock in self.shards:
+            try:
+                lsnetwork.sendMessage(sock, BYE)
+            except OSError:
+                pass
+        if self.conf.fileName is not None:
+            self.conf.calibrationMap = self.calibrationMap
+            self.conf.compactJournal(message="Saving calibration map...")
+
+    def _receive(self, sock):
+        # Runs as a thread for each shard, collecting sensor events and calibration changes
+        while True:
+            try:
+                (kind, payload) = lsnetwork.recvMessage(sock)
+            except (lsnetwork.ConnectionClosed, OSError):
+                print("Lost connection to a floor shard")
+                return
+            if kind == EVENT:
+                (timestamp, row, col, sensorPcnt) = lsnetwork.unpackEvent(payload)
+                self._events.put((timestamp, row, col, sensorPcnt))
+            elif kind == CALIBRATION:
+                changes = dict()
+                for (address, port, cal) in lsnetwork.unpackJSON(payload):
+                    self.calibrationMap[(address, port)] = cal
+                    changes[(address, port)] = cal
+                if self.conf.fileName is not None:
+                    self.conf.journalCalibration(changes)
+
+    def heartbeat(self):
+        self.frameNumber += 1
+        deltas = defaultdict(list)
+        for tile in self.tileList:
+            masks = lsnetwork.tileMasks(tile)
+            if self._shown.get((tile.row, tile.col)) != masks:
+                self._shown[(tile.row, tile.col)] = masks
+                deltas[self._shardOf[(tile.row, tile.col)]].append((tile.row, tile.col, masks))
+        latch = lsnetwork.LATCH.pack(self.frameNumber, time.time() + LATCH_DELAY)
+        with self._sendLock:
+            for (shardID, sock) in enumerate(self.shards):
+                if shardID in deltas:
+                    lsnetwork.sendMessage(sock, FRAME, lsnetwork.packTiles(self.frameNumber, deltas[shardID]))
+                lsnetwork.sendMessage(sock, LATCH, latch)
+
+    def pollEvents(self):
+        while True:
+            (timestamp, row, col, sensorPcnt) = self._events.get()
+            yield((row, col, sensorPcnt))
+
+
+class _LSShardConfig(LSFloorConfig):
+    # The configuration of a single shard. Calibration changes are sent to the
+    # coordinator, which owns the .floor file, instead of being written to disk.
+
+    def __init__(self, config, sendCalibration):
+        self.config = [tuple(cell) for cell in config]
+        self.cells = len(self.config)
+        self.rows = max(cell[0] for cell in self.config) + 1
+        self.cols = max(cell[1] for cell in self.config) + 1
+        self.calibrationMap = dict(((address, port), cal) for (row, col, port, address, cal) in self.config)
+        self.shards = None
+        self.ioProcess = False
+        self._sendCalibration = sendCalibration
+
+    def __deepcopy__(self, memo):
+        # Floor views deep copy their configuration, a shard only ever has the one
+        return self
+
+    def journalCalibration(self, changes):
+        self._sendCalibration(changes)
+
+    def compactJournal(self, message=None):
+        pass
+
+
+class LSShardWorker():
+    """
+        This class owns the ports of one shard of a floor. It waits for a coordinating
+        LSShardedFloor to connect, then puts the frames it receives on the floor at
+        the requested time and sends sensor events back.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.server = lsnetwork.listen(host, port)
+        self.address = self.server.getsockname()
+        self.floor = None
+        self.frameNumber = 0
+        self._pending = dict()
+        self._sock = None
+        self._sendLock = threading.Lock()
+
+    def serve(self):
+        """
+            Serves coordinators one after the other, forever.
+        """
+        print("Shard worker listening on {:s}:{:d}".format(self.address[0], self.address[1]))
+        while True:
+            (sock, peer) = lsnetwork.accept(self.server)
+            self._sock = sock
+            try:
+                self._serveCoordinator(sock)
+            except (lsnetwork.ConnectionClosed, OSError):
+                print("Coordinator went away")
+            self._sock = None
+            if self.floor is not None:
+                self.floor.clearAll()
+            sock.close()
+
+    def _serveCoordinator(self, sock):
+        while True:
+            (kind, payload) = lsnetwork.recvMessage(sock)
+            if kind == HELLO:
+                hello = lsnetwork.unpackJSON(payload)
+                if self.floor is None:
+                    self._makeFloor(hello["config"])
+                print("Serving shard {:d} ({:d} tiles)".format(hello["shard"], len(hello["config"])))
+            elif kind == FRAME:
+                (frameNumber, tiles) = lsnetwork.unpackTiles(payload)
+                for (row, col, masks) in tiles:
+                    self._pending[(row, col)] = masks
+            elif kind == LATCH:
+                (frameNumber, latchAt) = lsnetwork.LATCH.unpack(payload)
+                delay = latchAt - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                self.latch(frameNumber)
+            elif kind == BYE:
+                return
+
+    def _makeFloor(self, config):
+        conf = _LSShardConfig(config, self._sendCalibration)
+        self.floor = LSFloor(conf, eventCallback=self._sendEvent)
+
+    def latch(self, frameNumber):
+        """
+            Puts every tile received since the last latch on the floor
+        """
+        pending = self._pending
+        self._pending = dict()
+        for ((row, col), masks) in pending.items():
+            self.floor.tiles[row][col].setSegments(masks)    # The shard's own model of its tiles
+            self.floor.setSegments(row, col, masks)          # and its hardware
+        self.frameNumber = frameNumber
+
+    def injectEvent(self, row, col, sensorPcnt):
+        """
+            Feeds a sensor reading into the shard as if a tile had produced it, which
+            allows shards of virtual tiles to be exercised without hardware.
+        """
+        self.floor._events.put((row, col, sensorPcnt))
+
+    def _send(self, kind, payload):
+        sock = self._sock
+        if sock is None:
+            return
+        with self._sendLock:
+            try:
+                lsnetwork.sendMessage(sock, kind, payload)
+            except OSError:
+                pass
+
+    def _sendEvent(self, row, col, sensorPcnt):
+        self._send(EVENT, lsnetwork.packEvent(time.time(), row, col, sensorPcnt))
+
+    def _sendCalibration(self, changes):
+        entries = [[address, port, list(cal)] for ((address, port), cal) in changes.items()]
+        self._send(CALIBRATION, lsnetwork.packJSON(entries))
+
+
+def _runWorker(host, port, addressPipe):
+    worker = LSShardWorker(host, port)
+    addressPipe.send(worker.address)
+    addressPipe.close()
+    worker.serve()
+
+def spawnWorker(host="127.0.0.1", port=0):
+    """
+        Starts an LSShardWorker in a new local process and returns the address it is listening on
+    """
+    (parentEnd, childEnd) = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_runWorker, args=(host, port, childEnd), name="lsshard-worker")
+    process.daemon = True
+    process.start()
+    return parentEnd.recv()
+
+
+def main():
+    if len(sys.argv) > 1:
+        (host, port) = lsnetwork.parseAddress(sys.argv[1], defaultHost="0.0.0.0")
+    else:
+        (host, port) = ("0.0.0.0", 4117)
+    LSShardWorker(host, port).serve()
+
+if __name__ == '__main__':
+    main()
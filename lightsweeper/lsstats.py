@@ -0,0 +1,146 @@
+""" Keeps frame time statistics in a fixed amount of memory however long a game runs
+
+LSHistogram counts samples in buckets that grow geometrically, 5% apart by
+default, so percentiles come out to within a bucket's width and adding a sample
+costs a binary search. LSFrameStats keeps one histogram for each phase of the
+engine's tick, which LSGameEngine starts afresh for every game.
+"""
+
+from array import array
+from bisect import bisect_left
+
+import time
+
+_bounds = dict()
+
+def _bucketBounds(low, high, growth):
+    # The upper bound of every bucket, shared by histograms with the same settings
+    key = (low, high, growth)
+    if key not in _bounds:
+        bounds = [low]
+        while bounds[-1] < high:
+            bounds.append(bounds[-1] * growth)
+        _bounds[key] = bounds
+    return _bounds[key]
+
+
+class LSHistogram():
+    """
+        A histogram of durations in seconds, from low to high. Shorter samples are
+        counted in the first bucket and longer ones in the last.
+
+        Attributes:
+            count (int):            The number of samples
+            total (float):          The sum of the samples
+            max (float):            The longest sample
+    """
+
+    def __init__(self, low=1e-5, high=10.0, growth=1.05):
+        self._bounds = _bucketBounds(low, high, growth)
+        self.reset()
+
+    def reset(self):
+        self._counts = array('L', [0]) * (len(self._bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self._counts[bisect_left(self._bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, p):
+        """
+            Returns the duration that p percent of the samples took no longer than
+        """
+        if self.count == 0:
+            return 0.0
+        wanted = self.count * p / 100.0
+        seen = 0
+        for (i, n) in enumerate(self._counts):
+            seen += n
+            if seen >= wanted and n > 0:
+                return min(self._bounds[i] if i < len(self._bounds) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        return {"count": self.count,
+                "mean": self.mean(),
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "p99": self.percentile(99),
+                "max": self.max}
+
+
+class LSFrameStats():
+    """
+        Frame time statistics for one game. The phases are:
+
+            frame                   All the work done in a tick
+            heartbeat               The game's heartbeat
+            animations              Stepping the game's animations
+            display                 The display's heartbeat, which flushes the tick's changes to the floor
+            sleep                   Waiting for the next tick to be due
+
+        Attributes:
+            name (str):             The name of the game
+            ticks (int):            The number of ticks run
+            dropped (int):          The number of ticks skipped because they were due too long ago
+    """
+
+    PHASES = ("frame", "heartbeat", "animations", "display", "sleep")
+
+    def __init__(self, name=None, clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.phases = dict((phase, LSHistogram()) for phase in self.PHASES)
+        self.reset()
+
+    def reset(self):
+        for histogram in self.phases.values():
+            histogram.reset()
+        self.ticks = 0
+        self.dropped = 0
+        self.started = self.clock()
+        self.finished = None
+
+    def finish(self):
+        """
+            Marks the end of the game, fps() stops counting time from here
+        """
+        self.finished = self.clock()
+
+    def record(self, phase, seconds):
+        self.phases[phase].add(seconds)
+
+    def fps(self):
+        elapsed = (self.finished if self.finished is not None else self.clock()) - self.started
+        return self.ticks / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+            Returns a dictionary of the statistics, with a p50/p95/p99/max summary of each phase
+        """
+        summary = {"name": self.name, "ticks": self.ticks, "dropped": self.dropped, "fps": self.fps()}
+        for phase in self.PHASES:
+            summary[phase] = self.phases[phase].summary()
+        return summary
+
+    def report(self):
+        """
+            Returns the statistics as lines of text, times in milliseconds
+        """
+        lines = ["Stats for: {:s}".format(str(self.name)),
+                 "  FrameRate: {:.1f}fps over {:d} ticks, {:d} dropped".format(self.fps(), self.ticks, self.dropped)]
+        for phase in self.PHASES:
+            h = self.phases[phase]
+            if h.count > 0:
+                lines.append("  {:<11s} p50 {:7.2f}ms  p95 {:7.2f}ms  p99 {:7.2f}ms  max {:7.2f}ms".format(
+                             phase, h.percentile(50)*1000, h.percentile(95)*1000, h.percentile(99)*1000, h.max*1000))
+        return "\n".join(lines)
@@ -18,6 +18,7 @@ class LSTile():
         self.col = col
         self.color = None
         self.shape = None
+        self.masks = None       # The (red, green, blue) masks last set, None if changed some other way since
         self.segments = dict.fromkeys(list(map(chr, range(97, 97+7))))
         for segKey in self.segments.keys():
             self.segments[segKey] = None
@@ -33,6 +34,7 @@ class LSTile():
 
     def setColor(self, color):
        self.color = color
+       self.masks = None
        for segKey in self.segments.keys():
            segment = self.segments[segKey]
            if segment is not None:
@@ -41,6 +43,7 @@ class LSTile():
 
     def setShape(self, shape):
         self.shape = shape
+        self.masks = None
         if shape & Shapes.SEG_A:
             if self.segments["a"] is None:
                 self.segments["a"] = self.color
@@ -88,6 +91,7 @@ class LSTile():
         self.segments["f"] = c[5]
         self.segments["g"] = c[6]
         self.shape = rgb[0]|rgb[1]|rgb[2]
+        self.masks = tuple(rgb)
         
 
     def setTransition(self, transition):
@@ -356,6 +360,7 @@ class LSRealTile(LSTile):
         cmd = SET_COLOR
         self.__tileWrite([cmd, color])
         self.color = color
+        self.masks = None
 
     def setShape(self, shape):
         if self.shape is shape:
@@ -363,6 +368,7 @@ class LSRealTile(LSTile):
         cmd = SET_SHAPE
         self.__tileWrite([cmd, shape])
         self.shape = shape
+        self.masks = None
 
     def getShape(self):
         return self.shape
@@ -421,6 +427,7 @@ class LSRealTile(LSTile):
         args.insert(0, cmd) # couldn't insert cmd until all fields are added
         self.__tileWrite(args)
         self.shape = rgb[0]|rgb[1]|rgb[2]
+        self.masks = tuple(rgb) if clear else None
 
 
     # expecting a 7-tuple of Color constants
@@ -432,6 +439,7 @@ class LSRealTile(LSTile):
             return  # some kind of error - see Noah example
         digitMaps=[0x7E,0x30,0x6D,0x79,0x33,0x5B,0x7D,0x70,0x7F,0x7B]
         self.shape = digitMaps[digit]
+        self.masks = None
         cmd = SET_SHAPE
         self.__tileWrite([cmd, self.shape])
 
@@ -550,6 +558,7 @@ class LSRealTile(LSTile):
     def reset(self):
         versionCmd = LS_RESET
         self.__tileWrite([versionCmd], True)  # do not eat output
+        self.masks = None
         # return response in case tile spits stuff at reset
         time.sleep(1.0)
         val = self.__tileRead()
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def lightsweeperConf(tmp_path, monkeypatch):
+    # Configurations are looked for in the working directory, among other places
+    (tmp_path / "lightsweeper.conf").write_text("GAMESDIR={0}\nFLOORSDIR={0}\n".format(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
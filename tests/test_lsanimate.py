@@ -0,0 +1,32 @@
+""" Frames read back out of animations """
+
+from lightsweeper import Colors
+from lightsweeper.lsanimate import LSAnimation
+from lightsweeper.lsanimate import ScrollingText
+
+
+def test_scrolling_text_frames_read_before_it_is_built():
+    text = ScrollingText("HI", Colors.RED, width=4)
+    frame = text._frames[0]
+    assert frame[0] == 4
+    assert len(frame) == 1 + 4*3
+
+
+def test_scrolling_text_frames_follow_a_new_width():
+    text = ScrollingText("HI", Colors.RED, width=4)
+    text.numFrames()
+    text.width = 6
+    frame = text.getListFrame(0)
+    assert frame[0] == 6
+    assert len(frame) == 1 + 6*3
+
+
+def test_frames_can_be_held_while_the_animation_changes():
+    animation = LSAnimation()
+    animation.addFrame([2, 1, 2, 3, 4, 5, 6])
+    held = animation.getFrame(0)
+    animation.addFrame([2, 0, 0, 0, 0, 0, 0])
+    animation.insertFrame(0, [2, 6, 5, 4, 3, 2, 1])
+    animation.deleteFrame(1)
+    assert bytes(held) == bytes([1, 2, 3, 4, 5, 6])
+    assert animation.numFrames() == 2
@@ -0,0 +1,32 @@
+""" Animation files read back while their frames are held """
+
+from lightsweeper import lsanimfile
+from lightsweeper.lsanimate import LSAnimation
+
+
+def stripes(path):
+    animation = LSAnimation()
+    for n in range(5):
+        animation.addFrame([2, n, 0, 0, 0, 0, n])
+    lsanimfile.saveAnimation(animation, str(path), keyframeInterval=2)
+    return animation
+
+
+def test_file_closes_while_a_keyframe_is_held(tmp_path):
+    animation = stripes(tmp_path / "stripes.lsa")
+    with lsanimfile.LSAnimationFile(str(tmp_path / "stripes.lsa")) as stripesFile:
+        keyframe = stripesFile.getFrame(0)
+        delta = stripesFile.getFrame(3)
+    assert stripesFile._file.closed
+    assert bytes(keyframe) == animation.getFrame(0)
+    assert bytes(delta) == animation.getFrame(3)
+
+
+def test_close_twice(tmp_path):
+    stripes(tmp_path / "stripes.lsa")
+    stripesFile = lsanimfile.LSAnimationFile(str(tmp_path / "stripes.lsa"))
+    held = stripesFile.getFrame(2)
+    stripesFile.close()
+    stripesFile.close()
+    assert stripesFile._file.closed
+    assert len(held) == 2*3
@@ -0,0 +1,137 @@
+""" Watches a mirrored floor from a client over loopback """
+
+import time
+
+import pytest
+
+from lightsweeper import Colors
+from lightsweeper import Shapes
+from lightsweeper import lsnetwork
+from lightsweeper.lsconfig import LSFloorConfig
+from lightsweeper.lsemulate import LSMirrorClient
+from lightsweeper.lsemulate import LSMirrorFloor
+from lightsweeper.lsfloor import LSFloor
+
+
+class LoopbackMirror(LSMirrorFloor):
+    host = "127.0.0.1"
+    port = 0
+
+
+def waitFor(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def makeMirror(**settings):
+    conf = LSFloorConfig(rows=3, cols=4)
+    conf.makeVirtual()
+    floor = LSFloor(conf, threaded=False)   # Nothing but the test reads the view's events
+    floor.register(LoopbackMirror, **settings)
+    mirror = floor.views[-1]
+    clients = list()
+
+    def connect():
+        client = LSMirrorClient(mirror.address)
+        client.sock.settimeout(5)
+        clients.append(client)
+        return client
+
+    return (floor, mirror, connect, clients)
+
+
+@pytest.fixture
+def mirroredFloor():
+    (floor, view, connect, clients) = makeMirror()
+    yield (floor, view, connect)
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def steppableMirror():
+    (floor, view, connect, clients) = makeMirror(acceptEvents=True)
+    yield (floor, view, connect)
+    for client in clients:
+        client.close()
+
+
+def test_client_gets_a_keyframe_then_deltas(mirroredFloor):
+    (floor, mirror, connect) = mirroredFloor
+    floor.set(0, 1, Shapes.digitToHex(3), Colors.GREEN)
+    floor.heartbeat()
+
+    client = connect()
+    client.receive()
+    assert (client.rows, client.cols) == (3, 4)
+    assert client.frameNumber == mirror.frameNumber
+    assert client.tiles[(0, 1)] == lsnetwork.tileMasks(mirror.tiles[0][1])
+
+    floor.set(2, 3, Shapes.digitToHex(8), Colors.RED)
+    floor.heartbeat()
+    changed = client.receive()
+    assert [(row, col) for (row, col, masks) in changed] == [(2, 3)]
+    assert client.tiles[(2, 3)] == lsnetwork.tileMasks(mirror.tiles[2][3])
+    assert client.tiles[(0, 1)] == lsnetwork.tileMasks(mirror.tiles[0][1])
+    assert client.frameNumber == mirror.frameNumber
+
+
+def test_late_client_sees_the_whole_floor(mirroredFloor):
+    (floor, mirror, connect) = mirroredFloor
+    first = connect()
+    first.receive()
+    for col in range(4):
+        floor.set(1, col, Shapes.digitToHex(col), Colors.BLUE)
+        floor.heartbeat()
+
+    second = connect()
+    second.receive()
+    for col in range(4):
+        assert second.tiles[(1, col)] == lsnetwork.tileMasks(mirror.tiles[1][col])
+
+
+def test_mirror_only_listens_locally_by_default():
+    assert LSMirrorFloor.host == "127.0.0.1"
+    assert LSMirrorFloor.acceptEvents is False
+
+
+def test_client_events_are_ignored_by_default(mirroredFloor):
+    (floor, mirror, connect) = mirroredFloor
+    client = connect()
+    client.receive()
+    client.sendEvent(2, 1, 80)
+    client.close()
+    assert waitFor(lambda: not mirror._clients[0].alive)
+    assert mirror._events.empty()
+    assert floor._events.empty()
+
+
+def test_client_hanging_up_ends_its_connection(mirroredFloor):
+    (floor, mirror, connect) = mirroredFloor
+    client = connect()
+    client.receive()
+    connection = mirror._clients[0]
+    client.close()
+    connection.join(5)                  # No floor change needed to notice
+    assert not connection.is_alive()
+    assert not connection.alive
+
+
+def test_client_events_come_out_of_pollEvents(steppableMirror):
+    (floor, mirror, connect) = steppableMirror
+    client = connect()
+    client.receive()
+    client.sendEvent(2, 1, 80)
+    client.sendEvent(2, 1, 0)
+    events = list()
+    deadline = time.monotonic() + 5
+    while len(events) < 2 and time.monotonic() < deadline:
+        event = mirror.io.poll()
+        if len(event) > 0:
+            events.append(event)
+    assert events == [(2, 1, 80), (2, 1, 0)]
+    assert floor._events.get_nowait() == (2, 1, 80)     # and passed on to the root floor
@@ -0,0 +1,74 @@
+""" Runs a sharded floor against an in-process worker over loopback """
+
+import threading
+import time
+
+import pytest
+
+from lightsweeper import Colors
+from lightsweeper import Shapes
+from lightsweeper import lsnetwork
+from lightsweeper.lsconfig import LSFloorConfig
+from lightsweeper.lsfloor import LSFloor
+from lightsweeper.lsshard import LSShardWorker
+from lightsweeper.lsshard import LSShardedFloor
+from lightsweeper.lsshard import partitionPorts
+
+
+def waitFor(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def shardedFloor():
+    worker = LSShardWorker("127.0.0.1", 0)
+    # The worker builds its floor on this thread, which makes the floor's threads daemons too
+    server = threading.Thread(target=worker.serve, name="shard-worker")
+    server.daemon = True
+    server.start()
+
+    conf = LSFloorConfig(rows=2, cols=3)
+    conf.makeVirtual()
+    conf.shards = "127.0.0.1:{:d}".format(worker.address[1])
+    floor = LSFloor(conf, threaded=False)   # Nothing but the test reads the view's events
+    floor.register(LSShardedFloor)
+    assert waitFor(lambda: worker.floor is not None)
+    return (floor, floor.views[-1], worker)
+
+
+def test_partitionPorts_splits_by_port():
+    config = [(0, 0, "COM1", 1, [0, 127]), (0, 1, "COM1", 2, [0, 127]),
+              (1, 0, "COM2", 1, [0, 127]), (1, 1, "COM3", 1, [0, 127])]
+    shards = partitionPorts(config, 2)
+    assert len(shards) == 2
+    assert [set(cell[2] for cell in shard) for shard in shards] == [{"COM1", "COM3"}, {"COM2"}]
+    assert sorted(cell for shard in shards for cell in shard) == sorted(config)
+    assert len(partitionPorts(config, 10)) == 3         # No more shards than ports
+
+
+def test_worker_shows_frames_after_the_latch(shardedFloor):
+    (floor, view, worker) = shardedFloor
+    floor.set(1, 2, Shapes.digitToHex(7), Colors.RED)
+    floor.heartbeat()
+    assert waitFor(lambda: worker.frameNumber == view.frameNumber)
+    expected = lsnetwork.tileMasks(view.tiles[1][2])
+    assert lsnetwork.tileMasks(worker.floor.tiles[1][2]) == expected
+    assert expected != (0, 0, 0)
+
+    floor.set(0, 0, Shapes.digitToHex(1), Colors.BLUE)
+    floor.heartbeat()
+    assert waitFor(lambda: worker.frameNumber == view.frameNumber)
+    assert lsnetwork.tileMasks(worker.floor.tiles[0][0]) == lsnetwork.tileMasks(view.tiles[0][0])
+    assert lsnetwork.tileMasks(worker.floor.tiles[1][2]) == expected
+
+
+def test_injected_events_reach_pollEvents(shardedFloor):
+    (floor, view, worker) = shardedFloor
+    worker.injectEvent(1, 1, 80)
+    assert waitFor(lambda: not view._events.empty())
+    assert next(view.pollEvents()) == (1, 1, 80)